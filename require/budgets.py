@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+
+import io, json, warnings
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured
+
+from require.compress import gzip_compress
+from require.conf import settings as require_settings
+from require.helpers import resolve_require_url
+
+
+SIZE_KINDS = ("raw", "minified", "compressed")
+
+
+class SizeBudgetError(Exception):
+
+    pass
+
+
+class SizeBudgetWarning(UserWarning):
+
+    pass
+
+
+def sizes_enabled():
+    """Returns True if any setting needs the sizes of the optimized files."""
+    return bool(
+        require_settings.REQUIRE_SIZE_BUDGETS or
+        require_settings.REQUIRE_SIZE_MAX_GROWTH is not None or
+        require_settings.REQUIRE_SIZE_REPORT is not None
+    )
+
+
+def measure(content, raw_size=None):
+    """
+    Returns the raw, minified and gzip compressed sizes of an optimized file.
+
+    The raw size is the total size of the files it was built from, or None if unknown.
+    """
+    return OrderedDict((
+        ("raw", raw_size),
+        ("minified", len(content)),
+        ("compressed", len(gzip_compress(content))),
+    ))
+
+
+def parse_size_report(content):
+    """Returns the sizes from a size report, or None if it is not a valid size report."""
+    try:
+        size_report = json.loads(content.decode("utf-8"))
+    except ValueError:
+        return None
+    if not isinstance(size_report, dict) or size_report.get("version") != 1:
+        return None
+    return size_report["sizes"]
+
+
+def load_baseline():
+    """Returns the sizes from the REQUIRE_SIZE_BASELINE report, or None if it is not set."""
+    if require_settings.REQUIRE_SIZE_BASELINE is None:
+        return None
+    with io.open(require_settings.REQUIRE_SIZE_BASELINE, "rb") as handle:
+        baseline = parse_size_report(handle.read())
+    if baseline is None:
+        raise ImproperlyConfigured("REQUIRE_SIZE_BASELINE setting is not a size report: {path!r}.".format(
+            path = require_settings.REQUIRE_SIZE_BASELINE,
+        ))
+    return baseline
+
+
+def check_sizes(sizes, baseline=None):
+    """
+    Returns a message for each optimized file over its budget in REQUIRE_SIZE_BUDGETS, or that
+    has grown by more than REQUIRE_SIZE_MAX_GROWTH since the baseline.
+    """
+    problems = []
+    for name, budget in sorted(require_settings.REQUIRE_SIZE_BUDGETS.items()):
+        for kind in sorted(budget):
+            if kind not in SIZE_KINDS:
+                raise ImproperlyConfigured("Unknown size {kind!r} for {name} in REQUIRE_SIZE_BUDGETS setting.".format(
+                    kind = kind,
+                    name = name,
+                ))
+    for name, budget in sorted(require_settings.REQUIRE_SIZE_BUDGETS.items()):
+        storage_name = resolve_require_url(name)
+        if storage_name not in sizes:
+            problems.append("No optimized file {name} for its budget in REQUIRE_SIZE_BUDGETS setting.".format(
+                name = storage_name,
+            ))
+            continue
+        for kind, max_size in sorted(budget.items()):
+            size = sizes[storage_name][kind]
+            if size is not None and size > max_size:
+                problems.append("{name} is {size} bytes {kind}, over its budget of {max_size} bytes.".format(
+                    name = storage_name,
+                    size = size,
+                    kind = kind,
+                    max_size = max_size,
+                ))
+    max_growth = require_settings.REQUIRE_SIZE_MAX_GROWTH
+    if baseline and max_growth is not None:
+        for name, file_sizes in sorted(sizes.items()):
+            for kind in SIZE_KINDS:
+                old_size = baseline.get(name, {}).get(kind)
+                size = file_sizes[kind]
+                if old_size and size is not None and size > old_size * (1 + max_growth):
+                    problems.append("{name} grew from {old_size} to {size} bytes {kind}, by more than {percent:g}%.".format(
+                        name = name,
+                        old_size = old_size,
+                        size = size,
+                        kind = kind,
+                        percent = max_growth * 100,
+                    ))
+    return problems
+
+
+def size_report_content(sizes, baseline, problems):
+    return json.dumps({
+        "version": 1,
+        "sizes": sizes,
+        "baseline": baseline,
+        "problems": problems,
+    }, indent=2, sort_keys=True).encode("utf-8")
+
+
+def enforce_budgets(problems):
+    """
+    Raises a SizeBudgetError for the given problems if REQUIRE_SIZE_BUDGETS_STRICT is True, or
+    warns about each of them otherwise.
+    """
+    if not problems:
+        return
+    if require_settings.REQUIRE_SIZE_BUDGETS_STRICT:
+        raise SizeBudgetError("Size budgets exceeded:\n{problems}".format(
+            problems = "\n".join(problems),
+        ))
+    for problem in problems:
+        warnings.warn(problem, SizeBudgetWarning)
@@ -0,0 +1,253 @@
+from __future__ import unicode_literals
+
+import os, os.path, re, hashlib, json, shutil, tempfile, binascii
+
+from django.core.files.base import ContentFile
+
+from require.conf import settings as require_settings
+from require.environments import resolve_environment
+from require.helpers import import_module_attr, makedirs
+
+
+class DirectoryCacheBackend(object):
+
+    """Stores cached standalone modules as files in a local dir."""
+
+    def __init__(self, location):
+        self.location = location
+
+    def get(self, name):
+        """Returns the contents of the named entry, or None if it does not exist."""
+        try:
+            with open(os.path.join(self.location, name), "rb") as handle:
+                return handle.read()
+        except (IOError, OSError):
+            return None
+
+    def set(self, name, content):
+        makedirs(self.location)
+        # Write to a temporary file, and move it into place atomically.
+        with tempfile.NamedTemporaryFile(dir=self.location, delete=False) as handle:
+            handle.write(content)
+        os.rename(handle.name, os.path.join(self.location, name))
+
+
+class StorageCacheBackend(object):
+
+    """
+    Stores cached standalone modules in a Django storage, such as a bucket shared by several
+    build machines.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def get(self, name):
+        """Returns the contents of the named entry, or None if it does not exist."""
+        try:
+            if not self.storage.exists(name):
+                return None
+            with self.storage.open(name, "rb") as handle:
+                return handle.read()
+        except (IOError, OSError):
+            return None
+
+    def set(self, name, content):
+        if self.storage.exists(name):
+            self.storage.delete(name)
+        self.storage.save(name, ContentFile(content))
+
+
+def load_build_cache():
+    """
+    Returns the build cache described by the REQUIRE_BUILD_CACHE_DIR and
+    REQUIRE_MODULE_CACHE_STORAGE settings, or None if caching is disabled.
+    """
+    if require_settings.REQUIRE_MODULE_CACHE_STORAGE is not None:
+        storage_class = import_module_attr(require_settings.REQUIRE_MODULE_CACHE_STORAGE)
+        module_backend = StorageCacheBackend(storage_class(**require_settings.REQUIRE_MODULE_CACHE_STORAGE_OPTIONS))
+    elif require_settings.REQUIRE_BUILD_CACHE_DIR is not None:
+        module_backend = DirectoryCacheBackend(os.path.join(require_settings.REQUIRE_BUILD_CACHE_DIR, "modules"))
+    else:
+        return None
+    return BuildCache(require_settings.REQUIRE_BUILD_CACHE_DIR, module_backend, require_settings.REQUIRE_BUILD_CACHE_MAX_ENTRIES)
+
+
+class BuildCache(object):
+
+    """
+    A persistent on-disk cache of r.js build outputs.
+
+    Each entry is keyed by the digests of every compiled asset, the build profiles and the
+    optimizer resources, and contains the files that the optimizer modified or produced.
+
+    Standalone modules are also cached individually in the module backend, so that only modules
+    with changed inputs need rebuilding. Each built module is stored under a hash of its inputs,
+    so the backend can safely be shared by several build machines.
+
+    Whole builds are only cached if a cache dir is given, keeping the max_entries most recently
+    used builds, or all of them if max_entries is None.
+    """
+
+    CACHE_VERSION = "4"
+
+    ENTRY_NAME_RE = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, cache_dir, module_backend=None, max_entries=None):
+        self.cache_dir = cache_dir
+        self.module_backend = module_backend
+        self.max_entries = max_entries
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _hash_resources(self, hash, env):
+        # Hash the bundled optimizer and default build profiles.
+        for resource_name in ("r.js", "almond.js", "app.build.js", "module.build.js"):
+            with open(env.resource_path(resource_name), "rb") as handle:
+                hash.update(hashlib.md5(handle.read()).digest())
+        # Hash the environment that runs the optimizer, and its version.
+        environment, version = resolve_environment()
+        hash.update(json.dumps([
+            "{module}.{name}".format(module=environment.__module__, name=environment.__name__),
+            version,
+        ]).encode("utf-8"))
+
+    def key(self, env, compile_info):
+        hash = hashlib.md5()
+        hash.update(self.CACHE_VERSION.encode("ascii"))
+        # Hash the settings that affect the build output.
+        hash.update(json.dumps([
+            require_settings.REQUIRE_BASE_URL,
+            require_settings.REQUIRE_BUILD_PROFILE,
+            require_settings.REQUIRE_STANDALONE_MODULES,
+            require_settings.REQUIRE_SHARED_CHUNK,
+            require_settings.REQUIRE_SOURCE_MAPS,
+        ], sort_keys=True).encode("utf-8"))
+        self._hash_resources(hash, env)
+        # Hash the compiled assets, which includes any custom build profiles.
+        for name, digest in sorted(compile_info.items()):
+            hash.update(name.encode("utf-8"))
+            hash.update(digest)
+        return hash.hexdigest()
+
+    def restore(self, key, build_dir):
+        """Copies a cached build into the build dir, returning False on a cache miss."""
+        if self.cache_dir is None:
+            return False
+        entry_path = self.entry_path(key)
+        if not os.path.isdir(entry_path):
+            return False
+        for entry_dirpath, _, entry_filenames in os.walk(entry_path):
+            dst_dirpath = os.path.join(build_dir, os.path.relpath(entry_dirpath, entry_path))
+            makedirs(dst_dirpath)
+            for entry_filename in entry_filenames:
+                shutil.copyfile(
+                    os.path.join(entry_dirpath, entry_filename),
+                    os.path.join(dst_dirpath, entry_filename),
+                )
+        # Mark the entry as recently used, so it is kept when older entries are pruned.
+        os.utime(entry_path, None)
+        return True
+
+    def store(self, key, build_dir, build_names):
+        """Stores the named files from the build dir in the cache."""
+        if self.cache_dir is None:
+            return
+        makedirs(self.cache_dir)
+        # Assemble the entry in a temporary dir, and move it into place atomically.
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            for build_name in build_names:
+                dst_path = os.path.join(tmp_path, build_name)
+                dst_dir = os.path.dirname(dst_path)
+                makedirs(dst_dir)
+                shutil.copyfile(os.path.join(build_dir, build_name), dst_path)
+            try:
+                os.rename(tmp_path, self.entry_path(key))
+            except OSError:
+                pass  # Another build stored this entry first.
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.prune()
+
+    def prune(self):
+        """Deletes all but the max_entries most recently used builds from the cache dir."""
+        if self.cache_dir is None or self.max_entries is None:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_path = self.entry_path(name)
+            if self.ENTRY_NAME_RE.match(name) and os.path.isdir(entry_path):
+                try:
+                    entries.append((os.path.getmtime(entry_path), entry_path))
+                except OSError:
+                    pass  # Pruned by another build.
+        entries.sort(reverse=True)
+        for _, entry_path in entries[self.max_entries:]:
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+    def module_key(self, env, standalone_module, standalone_config):
+        hash = hashlib.md5()
+        hash.update(self.CACHE_VERSION.encode("ascii"))
+        hash.update(json.dumps([
+            require_settings.REQUIRE_BASE_URL,
+            standalone_module,
+            standalone_config,
+            require_settings.REQUIRE_SOURCE_MAPS,
+        ], sort_keys=True).encode("utf-8"))
+        self._hash_resources(hash, env)
+        return hash.hexdigest()
+
+    def _module_output_name(self, key, inputs):
+        # The output of a module is determined by its key and the digests of its inputs.
+        hash = hashlib.md5()
+        hash.update(key.encode("ascii"))
+        for name, digest in sorted(inputs.items()):
+            hash.update(name.encode("utf-8"))
+            hash.update(digest.encode("ascii"))
+        return hash.hexdigest() + ".out"
+
+    def restore_module(self, key, compile_info, out_path):
+        """
+        Copies a cached standalone module to the given path, returning the names of its inputs,
+        or None if the module is not cached, or any of its inputs have changed.
+        """
+        if self.module_backend is None:
+            return None
+        record = self.module_backend.get(key + ".json")
+        if record is None:
+            return None
+        try:
+            inputs = json.loads(record.decode("utf-8"))["inputs"]
+        except (ValueError, KeyError):
+            return None
+        for name, digest in inputs.items():
+            if name not in compile_info or binascii.hexlify(compile_info[name]).decode("ascii") != digest:
+                return None
+        content = self.module_backend.get(self._module_output_name(key, inputs))
+        if content is None:
+            return None
+        out_dir = os.path.dirname(out_path)
+        makedirs(out_dir)
+        with open(out_path, "wb") as handle:
+            handle.write(content)
+        return sorted(inputs)
+
+    def store_module(self, key, compile_info, input_names, out_path):
+        """
+        Stores a built standalone module in the cache, along with the digests of its inputs.
+
+        Inputs that are not compiled assets, such as almond.js, are covered by the module key.
+        """
+        if self.module_backend is None:
+            return
+        inputs = dict(
+            (name, binascii.hexlify(compile_info[name]).decode("ascii"))
+            for name in input_names
+            if name in compile_info
+        )
+        # Write the output before the record, so a record never refers to a missing output.
+        with open(out_path, "rb") as handle:
+            self.module_backend.set(self._module_output_name(key, inputs), handle.read())
+        self.module_backend.set(key + ".json", json.dumps({"inputs": inputs}, sort_keys=True).encode("utf-8"))
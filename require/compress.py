@@ -0,0 +1,44 @@
+from __future__ import unicode_literals
+
+import gzip, io
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from require.conf import settings as require_settings
+
+
+def gzip_compress(content):
+    buffer = io.BytesIO()
+    # A fixed mtime keeps the output identical for identical input.
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as handle:
+        handle.write(content)
+    return buffer.getvalue()
+
+
+def brotli_compress(content):
+    return brotli.compress(content, quality=11)
+
+
+COMPRESSORS = {
+    "gzip": (".gz", gzip_compress),
+    "brotli": (".br", brotli_compress),
+}
+
+
+def load_compressors():
+    """Returns a list of (extension, compress) pairs for the formats in REQUIRE_COMPRESS."""
+    compressors = []
+    for format in require_settings.REQUIRE_COMPRESS:
+        if format not in COMPRESSORS:
+            raise ImproperlyConfigured("Unknown format {format!r} in REQUIRE_COMPRESS setting.".format(
+                format = format,
+            ))
+        if format == "brotli" and brotli is None:
+            raise ImproperlyConfigured("The brotli package is required to use brotli in REQUIRE_COMPRESS setting.")
+        compressors.append(COMPRESSORS[format])
+    return compressors
@@ -29,6 +29,110 @@ class LazySettings(object):
     def REQUIRE_EXCLUDE(self):
         return getattr(django_settings, "REQUIRE_EXCLUDE", ("build.txt",))
 
+    @property
+    def REQUIRE_BUILD_CACHE_DIR(self):
+        return getattr(django_settings, "REQUIRE_BUILD_CACHE_DIR", None)
+
+    @property
+    def REQUIRE_BUILD_CACHE_MAX_ENTRIES(self):
+        return getattr(django_settings, "REQUIRE_BUILD_CACHE_MAX_ENTRIES", 10)
+
+    @property
+    def REQUIRE_BUILD_WORKERS(self):
+        return getattr(django_settings, "REQUIRE_BUILD_WORKERS", 1)
+
+    @property
+    def REQUIRE_HASH_WORKERS(self):
+        return getattr(django_settings, "REQUIRE_HASH_WORKERS", None)
+
+    @property
+    def REQUIRE_COPY_MODE(self):
+        return getattr(django_settings, "REQUIRE_COPY_MODE", "copy")
+
+    @property
+    def REQUIRE_COPY_ALL(self):
+        return getattr(django_settings, "REQUIRE_COPY_ALL", True)
+
+    @property
+    def REQUIRE_DEPENDENCY_MANIFEST(self):
+        return getattr(django_settings, "REQUIRE_DEPENDENCY_MANIFEST", None)
+
+    @property
+    def REQUIRE_COMPRESS(self):
+        return getattr(django_settings, "REQUIRE_COMPRESS", ())
+
+    @property
+    def REQUIRE_COMPRESS_WORKERS(self):
+        return getattr(django_settings, "REQUIRE_COMPRESS_WORKERS", None)
+
+    @property
+    def REQUIRE_BUILD_REPORT(self):
+        return getattr(django_settings, "REQUIRE_BUILD_REPORT", None)
+
+    @property
+    def REQUIRE_UPLOAD_WORKERS(self):
+        return getattr(django_settings, "REQUIRE_UPLOAD_WORKERS", 1)
+
+    @property
+    def REQUIRE_UPLOAD_MAX_BYTES(self):
+        return getattr(django_settings, "REQUIRE_UPLOAD_MAX_BYTES", 64*1024*1024)
+
+    @property
+    def REQUIRE_PRUNE_MODULES(self):
+        return getattr(django_settings, "REQUIRE_PRUNE_MODULES", False)
+
+    @property
+    def REQUIRE_SHARED_CHUNK(self):
+        return getattr(django_settings, "REQUIRE_SHARED_CHUNK", None)
+
+    @property
+    def REQUIRE_STAGING_DIR(self):
+        return getattr(django_settings, "REQUIRE_STAGING_DIR", None)
+
+    @property
+    def REQUIRE_STAGING_MAX_BYTES(self):
+        return getattr(django_settings, "REQUIRE_STAGING_MAX_BYTES", 512*1024*1024)
+
+    @property
+    def REQUIRE_SOURCE_MAPS(self):
+        return getattr(django_settings, "REQUIRE_SOURCE_MAPS", False)
+
+    @property
+    def REQUIRE_DEBUG_STANDALONE(self):
+        return getattr(django_settings, "REQUIRE_DEBUG_STANDALONE", False)
+
+    @property
+    def REQUIRE_MODULE_CACHE_STORAGE(self):
+        return getattr(django_settings, "REQUIRE_MODULE_CACHE_STORAGE", None)
+
+    @property
+    def REQUIRE_MODULE_CACHE_STORAGE_OPTIONS(self):
+        return getattr(django_settings, "REQUIRE_MODULE_CACHE_STORAGE_OPTIONS", {})
+
+    @property
+    def REQUIRE_STREAMING(self):
+        return getattr(django_settings, "REQUIRE_STREAMING", False)
+
+    @property
+    def REQUIRE_SIZE_BUDGETS(self):
+        return getattr(django_settings, "REQUIRE_SIZE_BUDGETS", {})
+
+    @property
+    def REQUIRE_SIZE_BUDGETS_STRICT(self):
+        return getattr(django_settings, "REQUIRE_SIZE_BUDGETS_STRICT", False)
+
+    @property
+    def REQUIRE_SIZE_MAX_GROWTH(self):
+        return getattr(django_settings, "REQUIRE_SIZE_MAX_GROWTH", None)
+
+    @property
+    def REQUIRE_SIZE_BASELINE(self):
+        return getattr(django_settings, "REQUIRE_SIZE_BASELINE", None)
+
+    @property
+    def REQUIRE_SIZE_REPORT(self):
+        return getattr(django_settings, "REQUIRE_SIZE_REPORT", None)
+
     @property
     def REQUIRE_ENVIRONMENT(self):
         return getattr(django_settings, "REQUIRE_ENVIRONMENT", "auto")
@@ -38,6 +142,7 @@ class LazySettings(object):
         return getattr(django_settings, "REQUIRE_ENVIRONMENT_ALIASES", {
             'auto': 'require.environments.AutoEnvironment',
             'node': 'require.environments.NodeEnvironment',
+            'node-daemon': 'require.environments.NodeDaemonEnvironment',
             'rhino': 'require.environments.RhinoEnvironment',
             })
 
@@ -0,0 +1,267 @@
+from __future__ import unicode_literals
+
+import re, os, json, posixpath, tempfile, io
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import force_text
+
+from require.conf import settings as require_settings
+from require.helpers import resolve_require_url, resolve_require_module, resolve_shared_chunk, new_hash, static_manifest, makedirs
+
+
+DEFINE_RE = re.compile(r"""\b(define|require|requirejs)\s*\(\s*(?:(["'])([^"']+)\2\s*,\s*)?\[([^\]]*)\]""")
+
+NAMED_DEFINE_RE = re.compile(r"""(?<![\w$.])define\s*\(\s*(["'])([^"']+)\1\s*,""")
+
+DEFINE_CALL_RE = re.compile(r"""(?<![\w$.])define\s*\(""")
+
+# The arguments of a define() call whose dependencies are known: an optional literal id, then a
+# dependency array, a factory function, an object or a lone factory variable.
+DEFINE_ARGUMENT_RE = re.compile(r"""\s*(?:(["'])[^"'\\]+\1\s*,\s*)?(?:\[|\{|\(|function\b|[\w$.]+\s*\))""")
+
+REQUIRE_CALL_RE = re.compile(r"""(?<![\w$.])(?:require|requirejs)\s*\(""")
+
+REQUIRE_ARGUMENT_RE = re.compile(r"""\s*(?:\[|\)|(["'])([^"'\\]+)\1\s*\))""")
+
+STRING_RE = re.compile(r"""["']([^"']+)["']""")
+
+ARRAY_END_RE = re.compile(r"""\s*[,)]""")
+
+COMMENT_RE = re.compile(r"""/\*.*?\*/|//[^\n]*""", re.DOTALL)
+
+SPECIAL_MODULES = ("require", "exports", "module")
+
+
+def scan_dependencies(source):
+    """
+    Scans the source of an AMD module for define() and require() calls, including the
+    require("id") calls of CommonJS-style factory functions.
+
+    Returns a tuple of the module ids defined by name in the file, the module ids that the file
+    depends on, and whether the file has define() or require() calls whose dependencies are not
+    string literals.
+    """
+    provided_ids = []
+    dependency_ids = []
+    dynamic = False
+    for match in DEFINE_RE.finditer(source):
+        if match.group(1) == "define" and match.group(3) and match.group(3) not in provided_ids:
+            provided_ids.append(match.group(3))
+        for dependency_id in STRING_RE.findall(match.group(4)):
+            if dependency_id not in dependency_ids:
+                dependency_ids.append(dependency_id)
+        # Anything but string literals in the dependency array, or after it, is computed.
+        if COMMENT_RE.sub("", STRING_RE.sub("", match.group(4))).strip(" \t\r\n,") or ARRAY_END_RE.match(source, match.end()) is None:
+            dynamic = True
+    for match in NAMED_DEFINE_RE.finditer(source):
+        if match.group(2) not in provided_ids:
+            provided_ids.append(match.group(2))
+    for match in DEFINE_CALL_RE.finditer(source):
+        if DEFINE_ARGUMENT_RE.match(source, match.end()) is None:
+            dynamic = True
+    for match in REQUIRE_CALL_RE.finditer(source):
+        argument = REQUIRE_ARGUMENT_RE.match(source, match.end())
+        if argument is None:
+            dynamic = True
+        elif argument.group(2) and argument.group(2) not in dependency_ids:
+            dependency_ids.append(argument.group(2))
+    return provided_ids, dependency_ids, dynamic
+
+
+def resolve_module_id(module_id, parent_id=None):
+    """
+    Resolves a module id to an absolute module id, or None if it does not refer to a module
+    file under REQUIRE_BASE_URL.
+
+    Loader plugin ids resolve to the plugin module.
+    """
+    module_id = module_id.split("!", 1)[0]
+    if module_id in SPECIAL_MODULES or not module_id:
+        return None
+    if module_id.startswith("/") or ":" in module_id or module_id.endswith(".js"):
+        return None
+    if module_id.startswith(".") and parent_id is not None:
+        module_id = posixpath.normpath(posixpath.join(posixpath.dirname(parent_id), module_id))
+    return module_id
+
+
+def module_id_for_name(name):
+    """Returns the module id of a static file under REQUIRE_BASE_URL, or None."""
+    base_url = resolve_require_url(".")
+    prefix = "" if base_url == "." else base_url + "/"
+    name = name.replace("\\", "/")
+    if not name.startswith(prefix) or not name.endswith(".js"):
+        return None
+    return name[len(prefix):-len(".js")]
+
+
+class DependencyScanner(object):
+
+    """
+    Scans AMD modules for dependencies, caching the results by the digest of each file's
+    contents.
+
+    If given a cache path, the results are persisted between builds in a JSON file.
+    """
+
+    CACHE_VERSION = 3
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.results = {}
+        self.used_results = {}
+        if cache_path is not None:
+            try:
+                with io.open(cache_path, "r", encoding="utf-8") as handle:
+                    cache = json.loads(handle.read())
+                if cache["version"] == self.CACHE_VERSION:
+                    self.results = cache["files"]
+            except (IOError, OSError, ValueError, KeyError, TypeError):
+                pass
+
+    def scan(self, source):
+        digest = new_hash(source.encode("utf-8")).hexdigest()
+        result = self.results.get(digest)
+        if result is None:
+            result = scan_dependencies(source)
+        self.used_results[digest] = result
+        return result
+
+    def save(self):
+        """Saves the results used since the cache was loaded, dropping all others."""
+        if self.cache_path is None:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        makedirs(cache_dir)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as handle:
+            handle.write(json.dumps({
+                "version": self.CACHE_VERSION,
+                "files": self.used_results,
+            }, sort_keys=True).encode("utf-8"))
+        os.rename(handle.name, self.cache_path)
+
+
+def build_dependency_graph(sources, scan=scan_dependencies, unresolved=None):
+    """
+    Builds the dependency graph of the given static files, from an iterable of (name, source)
+    pairs.
+
+    Returns a dict mapping each static file name to the names of the static files it directly
+    depends on. Dependencies defined by name in the same file are omitted.
+
+    If an unresolved dict is given, the ids of any dependencies that do not resolve to one of
+    the static files, such as paths aliases and loader plugin resources, are added to it, keyed
+    by name. A define() or require() call with dependencies that are not string literals is
+    added as None.
+    """
+    scanned = {}
+    providers = {}
+    for name, source in sources:
+        module_id = module_id_for_name(name)
+        if module_id is None:
+            continue
+        provided_ids, dependency_ids, dynamic = scan(source)
+        scanned[name] = (module_id, set(provided_ids), dependency_ids)
+        providers.setdefault(module_id, name)
+        for provided_id in provided_ids:
+            providers.setdefault(provided_id, name)
+        if dynamic and unresolved is not None:
+            unresolved.setdefault(name, []).append(None)
+    graph = {}
+    for name, (module_id, provided_ids, dependency_ids) in scanned.items():
+        dependency_names = []
+        for dependency_id in dependency_ids:
+            resolved_id = resolve_module_id(dependency_id, module_id)
+            if resolved_id is None or resolved_id in provided_ids:
+                dependency_name = None
+            else:
+                dependency_name = providers.get(resolved_id)
+            if unresolved is not None and dependency_id not in SPECIAL_MODULES and (
+                "!" in dependency_id or
+                (dependency_name is None and resolved_id not in provided_ids)
+            ):
+                unresolved.setdefault(name, []).append(dependency_id)
+            if dependency_name is not None and dependency_name != name and dependency_name not in dependency_names:
+                dependency_names.append(dependency_name)
+        graph[name] = dependency_names
+    return graph
+
+
+def transitive_dependencies(graph, name):
+    """Returns the names of all the static files that a static file depends on, dependencies first."""
+    dependency_names = []
+    visited = set([name])
+    def visit(name):
+        for dependency_name in graph.get(name, ()):
+            if dependency_name not in visited:
+                visited.add(dependency_name)
+                visit(dependency_name)
+                dependency_names.append(dependency_name)
+    visit(name)
+    return dependency_names
+
+
+def reachable_names(graph, root_names):
+    """Returns the set of names in the graph reachable from any of the given root names."""
+    names = set()
+    pending = [root_name for root_name in root_names if root_name in graph]
+    while pending:
+        name = pending.pop()
+        if name not in names:
+            names.add(name)
+            pending.extend(graph[name])
+    return names
+
+
+# The loaded dependency graph, keyed by storage and graph file, along with the static files
+# manifest it was loaded with. The graph refers to unhashed names, so storages without a
+# manifest to check keep it until their settings change.
+_graph_cache = {}
+
+
+@receiver(setting_changed)
+def clear_graph_cache(**kwargs):
+    _graph_cache.clear()
+
+
+def load_dependency_graph():
+    """
+    Loads the dependency graph written by collectstatic to REQUIRE_DEPENDENCY_MANIFEST.
+
+    Returns an empty graph if the dependency manifest is disabled or missing.
+    """
+    manifest = static_manifest()
+    if manifest is False:
+        manifest = None
+    cache_key = (getattr(staticfiles_storage, "_wrapped", staticfiles_storage), require_settings.REQUIRE_DEPENDENCY_MANIFEST)
+    cached = _graph_cache.get(cache_key)
+    if cached is not None and cached[0] is manifest:
+        return cached[1]
+    graph = {}
+    if require_settings.REQUIRE_DEPENDENCY_MANIFEST:
+        try:
+            with staticfiles_storage.open(require_settings.REQUIRE_DEPENDENCY_MANIFEST) as handle:
+                graph = json.loads(force_text(handle.read()))["files"]
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+    _graph_cache[cache_key] = (manifest, graph)
+    return graph
+
+
+def preload_names(module):
+    """
+    Returns the names of the static files needed to run the named module, including all of its
+    dependencies, as rendered by the require_module template tag.
+    """
+    if require_settings.REQUIRE_DEBUG and require_settings.REQUIRE_DEBUG_STANDALONE and module in require_settings.REQUIRE_STANDALONE_MODULES:
+        return []  # Built on demand, rather than served as a static file.
+    if not require_settings.REQUIRE_DEBUG and module in require_settings.REQUIRE_STANDALONE_MODULES:
+        names = [resolve_require_module(require_settings.REQUIRE_STANDALONE_MODULES[module]["out"])]
+        shared_chunk_name = resolve_shared_chunk(module)
+        if shared_chunk_name is not None:
+            names.insert(0, shared_chunk_name)
+        return names
+    module_name = resolve_require_module(module)
+    return [resolve_require_url(require_settings.REQUIRE_JS), module_name] + transitive_dependencies(load_dependency_graph(), module_name)
@@ -1,64 +1,219 @@
 from __future__ import unicode_literals
 
-from distutils.spawn import find_executable
+import os.path, subprocess, json, sys, threading
 
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import force_text
 from django.utils.functional import cached_property
 
 from require.conf import settings as require_settings
 from require.helpers import import_module_attr
 
 
-def load_environment():
+# Detected environments, keyed by class path. Each entry holds the environment class to run
+# r.js with, and its version.
+_environment_cache = {}
+
+_environment_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def clear_environment_cache(**kwargs):
+    _environment_cache.clear()
+
+
+def resolve_environment():
+    """
+    Resolves the REQUIRE_ENVIRONMENT setting, returning the environment class to run r.js with,
+    and its version.
+
+    Environments are detected and probed once per process. Raises EnvironmentError if the
+    environment is not available.
+    """
     environment = require_settings.REQUIRE_ENVIRONMENT
     aliases = require_settings.REQUIRE_ENVIRONMENT_ALIASES
     environment = aliases.get(environment, environment)
-    environment = import_module_attr(environment)
-    return environment
+    with _environment_lock:
+        detected = _environment_cache.get(environment)
+        if detected is None:
+            detected = import_module_attr(environment).detect()
+            _environment_cache[environment] = detected
+    return detected
+
+
+def load_environment():
+    return resolve_environment()[0]
 
 
 class Environment(object):
+
+    # A command that prints the version of the environment, used to check that it is available.
+    version_args = None
+
     def __init__(self, environment):
         self.env = environment
 
+    @classmethod
+    def probe(cls):
+        """
+        Checks that the environment is available, returning its version, or None if the
+        environment has no version_args. Raises EnvironmentError if it is not available.
+        """
+        if cls.version_args is None:
+            return None
+        try:
+            process = subprocess.Popen(cls.version_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output, _ = process.communicate()
+        except OSError as ex:
+            raise EnvironmentError("{executable} is not available: {error}".format(
+                executable = cls.version_args[0],
+                error = ex,
+            ))
+        output = force_text(output, errors="replace").strip()
+        if process.returncode != 0:
+            raise EnvironmentError("{executable} is not working: {output}".format(
+                executable = cls.version_args[0],
+                output = output,
+            ))
+        return output.splitlines()[0] if output else ""
+
+    @classmethod
+    def detect(cls):
+        """Returns the environment class to run r.js with, and its version."""
+        return cls, cls.probe()
+
     def args(self):
         raise NotImplementedError()
 
+    def run_optimizer(self, optimizer_args, capture=False):
+        """
+        Runs r.js with the given optimizer args, returning its exit status and, if capture is
+        True, its output.
+        """
+        compiler_args = list(self.args())
+        compiler_args.extend([self.env.resource_path("r.js"), "-o"])
+        compiler_args.extend(optimizer_args)
+        if not capture:
+            return subprocess.call(compiler_args), ""
+        process = subprocess.Popen(compiler_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = process.communicate()
+        return process.returncode, force_text(output, errors="replace")
+
+    def close(self):
+        pass
+
 
 class NodeEnvironment(Environment):
+
+    version_args = ("node", "--version")
+
     def args(self):
         # Start of the command to run the compiler in Node.
         return ["node"]
 
 
+class NodeDaemonEnvironment(NodeEnvironment):
+    """
+    Runs r.js in long-lived node worker processes, which receive builds over stdin.
+
+    This avoids starting node and loading r.js for every build. A worker is started for
+    each concurrent build, and all workers are stopped when the environment is closed.
+    """
+
+    def __init__(self, environment):
+        super(NodeDaemonEnvironment, self).__init__(environment)
+        self._lock = threading.Lock()
+        self._workers = []
+        self._idle_workers = []
+
+    def _acquire_worker(self):
+        with self._lock:
+            if self._idle_workers:
+                return self._idle_workers.pop()
+        worker = subprocess.Popen(
+            self.args() + [self.env.resource_path("optimizer.worker.js"), self.env.resource_path("r.js")],
+            stdin = subprocess.PIPE,
+            stdout = subprocess.PIPE,
+        )
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def run_optimizer(self, optimizer_args, capture=False):
+        worker = self._acquire_worker()
+        try:
+            worker.stdin.write(json.dumps({"args": optimizer_args}).encode("utf-8") + b"\n")
+            worker.stdin.flush()
+            response = worker.stdout.readline()
+        except (IOError, OSError):
+            response = b""
+        if not response:
+            return 1, "r.js optimizer worker exited unexpectedly.\n"
+        with self._lock:
+            self._idle_workers.append(worker)
+        response = json.loads(response.decode("utf-8"))
+        if not capture:
+            sys.stdout.write(response["output"])
+            sys.stdout.flush()
+        return (0 if response["ok"] else 1), response["output"]
+
+    def close(self):
+        for worker in self._workers:
+            try:
+                worker.stdin.close()
+            except (IOError, OSError):
+                pass
+            worker.wait()
+        self._workers = []
+        self._idle_workers = []
+
+
 class RhinoEnvironment(Environment):
+
+    version_args = ("java", "-version")
+
     def args(self):
+        # The closure compiler is not bundled, but is used if added to the resources dir.
+        classpath = [self.env.resource_path("js.jar")]
+        if os.path.exists(self.env.resource_path("compiler.jar")):
+            classpath.append(self.env.resource_path("compiler.jar"))
         # Start of the command to run the compiler in Java.
         return [
             "java",
             "-Xss100M",
             "-classpath",
-            ":".join((
-                self.env.resource_path("js.jar"),
-                self.env.resource_path("compiler.jar"),
-            )),
+            os.pathsep.join(classpath),
             "org.mozilla.javascript.tools.shell.Main",
             "-opt", "-1",
         ]
 
 
 class AutoEnvironment(Environment):
+
     environments = [NodeEnvironment, RhinoEnvironment]
 
-    @cached_property
-    def environment(self):
-        for environment in self.environments:
-            environment = environment(self.env)
-            executable = environment.args()[0]
-            if find_executable(executable):
-                return environment
+    @classmethod
+    def detect(cls):
+        for environment in cls.environments:
+            try:
+                return environment.detect()
+            except EnvironmentError:
+                pass
 
         raise EnvironmentError("no environments detected: {envs}".format(
-            envs=', '.join([ str(env) for env in self.environments ])))
+            envs=', '.join([ str(env) for env in cls.environments ])))
+
+    @cached_property
+    def environment(self):
+        return self.detect()[0](self.env)
 
     def args(self):
         return self.environment.args()
+
+    def run_optimizer(self, optimizer_args, capture=False):
+        return self.environment.run_optimizer(optimizer_args, capture)
+
+    def close(self):
+        if "environment" in self.__dict__:
+            self.environment.close()
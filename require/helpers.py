@@ -1,14 +1,72 @@
 from __future__ import unicode_literals
 
-import posixpath
+import os, posixpath, hashlib, sys, errno
+from array import array
+from functools import partial
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
 try:
     from importlib import import_module
 except ImportError:
     from django.utils.importlib import import_module
 
+from django.contrib.staticfiles.storage import staticfiles_storage, ManifestFilesMixin
+
 from require.conf import settings as require_settings
 
 
+# BLAKE2 is faster than MD5 on 64-bit platforms, so use it to compare files where available.
+try:
+    new_hash = partial(hashlib.blake2b, digest_size=16)
+except AttributeError:  # Python < 3.6
+    new_hash = hashlib.md5
+
+# Arrays of unsigned long long are not available before Python 3.3.
+SIZE_TYPECODE = "Q" if sys.version_info >= (3, 3) else "L"
+
+
+class DigestTable(Mapping):
+
+    """
+    A compact mapping of file names to their digests, which also records the size of each file.
+
+    The digests are packed into a single bytearray and the sizes into an array, rather than
+    being held as separate objects, so that very large static trees use less memory.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._digest_size = new_hash().digest_size
+        self._digests = bytearray()
+        self._sizes = array(SIZE_TYPECODE)
+
+    def add(self, name, digest, size):
+        if len(digest) != self._digest_size:
+            raise ValueError("Expected a digest of {0} bytes.".format(self._digest_size))
+        index = self._indexes.get(name)
+        if index is None:
+            self._indexes[name] = len(self._sizes)
+            self._digests.extend(digest)
+            self._sizes.append(size)
+        else:
+            self._digests[index*self._digest_size:(index+1)*self._digest_size] = digest
+            self._sizes[index] = size
+
+    def size(self, name):
+        return self._sizes[self._indexes[name]]
+
+    def __getitem__(self, name):
+        index = self._indexes[name]
+        return bytes(self._digests[index*self._digest_size:(index+1)*self._digest_size])
+
+    def __iter__(self):
+        return iter(self._indexes)
+
+    def __len__(self):
+        return len(self._indexes)
+
 
 def import_module_attr(module):
     module, _, cls = module.rpartition('.')
@@ -17,6 +75,34 @@ def import_module_attr(module):
     return attr
 
 
+def static_manifest():
+    """
+    Returns the static files manifest that rendered URLs depend on, or False if they must not be
+    cached.
+
+    Manifest storages replace their manifest whenever it is reloaded, so a cached URL is valid
+    for as long as the same manifest is loaded. Cache-backed storages update their hashed names
+    in place, so their URLs are never cached.
+    """
+    hashed_files = getattr(staticfiles_storage, "hashed_files", None)
+    if hashed_files is not None and not isinstance(staticfiles_storage, ManifestFilesMixin):
+        return False
+    return hashed_files
+
+
+def makedirs(path):
+    """
+    Creates the named dir and any missing parents, unless it already exists.
+
+    Safe to call from several threads at once.
+    """
+    try:
+        os.makedirs(path)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            raise
+
+
 def resolve_require_url(name):
     return posixpath.normpath(posixpath.join(require_settings.REQUIRE_BASE_URL, name))
 
@@ -25,3 +111,17 @@ def resolve_require_module(name):
     if not posixpath.splitext(name)[-1].lower() == ".js":
         name += ".js"
     return resolve_require_url(name)
+
+
+def resolve_shared_chunk(module):
+    """
+    Returns the name of the shared chunk that must be loaded before the named module, or None if
+    the module does not use one.
+    """
+    if (
+        require_settings.REQUIRE_SHARED_CHUNK is None or
+        require_settings.REQUIRE_DEBUG or
+        module not in require_settings.REQUIRE_STANDALONE_MODULES
+    ):
+        return None
+    return resolve_require_module(require_settings.REQUIRE_SHARED_CHUNK["out"])
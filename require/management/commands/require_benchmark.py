@@ -0,0 +1,209 @@
+from __future__ import unicode_literals
+
+import os, os.path, shutil, tempfile, random, time, json, io
+from collections import OrderedDict
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from require.conf import settings as require_settings
+from require.signals import build_finished
+
+
+STORAGES = OrderedDict((
+    ("optimized", "require.storage.OptimizedStaticFilesStorage"),
+    ("manifest", "require.storage.OptimizedManifestStaticFilesStorage"),
+))
+
+MODULE_TEMPLATE = """define([{dependencies}], function({arguments}) {{
+    "use strict";
+    var values = [{values}];
+    function total() {{
+        var result = 0;
+        for (var i = 0; i < values.length; i++) {{
+            result += values[i] * {index};
+        }}
+        return result;
+    }}
+    return {{
+        name: "m{index}",
+        total: total,
+        dependencies: [{arguments}]
+    }};
+}});
+"""
+
+
+def generate_tree(src_dir, module_count, asset_count, seed=0):
+    """
+    Generates a synthetic AMD project into the given dir.
+
+    The modules form a tree rooted at js/main.js, with extra cross links, so every module is
+    reachable from main. Binary assets are random bytes between 1KB and 64KB.
+
+    Returns the total size of the generated files in bytes.
+    """
+    rng = random.Random(seed)
+    resources_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "resources"))
+    js_dir = os.path.join(src_dir, "js")
+    os.makedirs(os.path.join(js_dir, "bench"))
+    shutil.copyfile(os.path.join(resources_dir, "require.js"), os.path.join(js_dir, "require.js"))
+    shutil.copyfile(os.path.join(resources_dir, "module.build.js"), os.path.join(js_dir, "module.build.js"))
+    total_size = 0
+    with io.open(os.path.join(js_dir, "main.js"), "w", encoding="utf-8") as handle:
+        total_size += handle.write("require([\"bench/m0\"], function(m0) {\n    m0.total();\n});\n")
+    for index in range(module_count):
+        dependency_indexes = [child for child in (index * 2 + 1, index * 2 + 2) if child < module_count]
+        if index * 2 + 3 < module_count and rng.random() < 0.3:
+            dependency_indexes.append(rng.randrange(index * 2 + 3, module_count))
+        with io.open(os.path.join(js_dir, "bench", "m{0}.js".format(index)), "w", encoding="utf-8") as handle:
+            total_size += handle.write(MODULE_TEMPLATE.format(
+                index = index,
+                dependencies = ", ".join("\"bench/m{0}\"".format(child) for child in dependency_indexes),
+                arguments = ", ".join("m{0}".format(child) for child in dependency_indexes),
+                values = ", ".join(str(rng.randint(0, 1000)) for _ in range(rng.randint(4, 32))),
+            ))
+    if asset_count:
+        os.makedirs(os.path.join(src_dir, "img"))
+    for index in range(asset_count):
+        size = rng.randint(1024, 64 * 1024)
+        with open(os.path.join(src_dir, "img", "asset{0}.bin".format(index)), "wb") as handle:
+            handle.write(os.urandom(size))
+        total_size += size
+    return total_size
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Benchmarks collectstatic against generated AMD module trees.\n\n"
+        "Reports the time spent in each phase of the optimization pipeline, along with its I/O volume."
+    )
+
+    requires_model_validation = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            action = "store",
+            dest = "sizes",
+            default = "100,1000,10000",
+            help = "Comma separated numbers of modules to benchmark. Defaults to 100,1000,10000."
+        )
+        parser.add_argument(
+            "--assets",
+            action = "store",
+            type = int,
+            dest = "assets",
+            default = None,
+            help = "Number of binary assets to generate alongside the modules. Defaults to a tenth of the number of modules."
+        )
+        parser.add_argument(
+            "--storage",
+            action = "store",
+            dest = "storage",
+            choices = ["all"] + list(STORAGES),
+            default = "all",
+            help = "The storage to benchmark. Defaults to all of them."
+        )
+        parser.add_argument(
+            "--runs",
+            action = "store",
+            type = int,
+            dest = "runs",
+            default = 1,
+            help = "Number of times to run each benchmark. Defaults to 1."
+        )
+        parser.add_argument(
+            "--output",
+            action = "store",
+            dest = "output",
+            help = "Write the build report of every run to the named JSON file."
+        )
+
+    def run_benchmark(self, work_dir, storage_class):
+        static_root = os.path.join(work_dir, "static")
+        reports = []
+        def on_build_finished(report, **kwargs):
+            reports.append(report)
+        build_finished.connect(on_build_finished)
+        try:
+            with override_settings(
+                STATIC_ROOT = static_root,
+                STATICFILES_DIRS = (os.path.join(work_dir, "src"),),
+                STATICFILES_FINDERS = ("django.contrib.staticfiles.finders.FileSystemFinder",),
+                STATICFILES_STORAGE = storage_class,
+                REQUIRE_BASE_URL = "js",
+                REQUIRE_JS = "require.js",
+                REQUIRE_BUILD_PROFILE = None,
+                REQUIRE_STANDALONE_MODULES = {"main": {"out": "main-built.js", "build_profile": "module.build.js"}},
+                REQUIRE_BUILD_REPORT = None,
+                # Every run must build from scratch.
+                REQUIRE_BUILD_CACHE_DIR = None,
+                REQUIRE_MODULE_CACHE_STORAGE = None,
+            ):
+                start = time.time()
+                call_command("collectstatic", interactive=False, verbosity=0)
+                seconds = time.time() - start
+        finally:
+            build_finished.disconnect(on_build_finished)
+            shutil.rmtree(static_root, ignore_errors=True)
+        if not reports:
+            raise CommandError("{0} did not run the optimizer.".format(storage_class))
+        report = reports[-1]
+        report["collectstatic_seconds"] = seconds
+        return report
+
+    def format_report(self, report):
+        lines = ["  collectstatic {0:.2f}s, post_process {1:.2f}s".format(report["collectstatic_seconds"], report["seconds"])]
+        for name, seconds in report["phases"].items():
+            lines.append("    {0:<14} {1:>8.2f}s".format(name, seconds))
+        for name, value in report["counters"].items():
+            lines.append("    {0:<14} {1:>9}".format(name, value))
+        if report["optimizer_cpu_seconds"] is not None:
+            lines.append("    optimizer cpu {0:.2f}s, process lifetime peak rss {1}MB".format(
+                report["optimizer_cpu_seconds"],
+                report["process_lifetime_peak_rss"] // (1024 * 1024),
+            ))
+        return "\n".join(lines) + "\n"
+
+    def handle(self, **options):
+        verbosity = int(options.get("verbosity", 1))
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",")]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of numbers")
+        storages = list(STORAGES) if options["storage"] == "all" else [options["storage"]]
+        results = []
+        for size in sizes:
+            asset_count = size // 10 if options["assets"] is None else options["assets"]
+            work_dir = tempfile.mkdtemp()
+            try:
+                total_size = generate_tree(os.path.join(work_dir, "src"), size, asset_count)
+                for storage in storages:
+                    for run in range(options["runs"]):
+                        report = self.run_benchmark(work_dir, STORAGES[storage])
+                        results.append(OrderedDict((
+                            ("modules", size),
+                            ("assets", asset_count),
+                            ("bytes", total_size),
+                            ("storage", storage),
+                            ("environment", require_settings.REQUIRE_ENVIRONMENT),
+                            ("run", run + 1),
+                            ("report", report),
+                        )))
+                        if verbosity > 0:
+                            self.stdout.write("{0} modules, {1} assets ({2}KB), {3} storage, run {4}:\n".format(
+                                size,
+                                asset_count,
+                                total_size // 1024,
+                                storage,
+                                run + 1,
+                            ))
+                            self.stdout.write(self.format_report(report))
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        if options["output"]:
+            with io.open(options["output"], "w", encoding="utf-8") as handle:
+                handle.write(json.dumps(results, indent=2, ensure_ascii=False))
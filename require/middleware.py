@@ -0,0 +1,35 @@
+from __future__ import unicode_literals
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10
+    MiddlewareMixin = object
+
+from require.dependencies import preload_names
+
+
+class PreloadMiddleware(MiddlewareMixin):
+
+    """
+    Adds a Link header to preload the scripts needed by every module rendered with the
+    require_module template tag, including all of their dependencies.
+    """
+
+    def process_response(self, request, response):
+        urls = []
+        for module in getattr(request, "require_modules", ()):
+            for name in preload_names(module):
+                url = staticfiles_storage.url(name)
+                if url not in urls:
+                    urls.append(url)
+        if urls:
+            links = [response["Link"]] if response.has_header("Link") else []
+            links.extend(
+                "<{url}>; rel=preload; as=script".format(url=url)
+                for url
+                in urls
+            )
+            response["Link"] = ", ".join(links)
+        return response
@@ -0,0 +1,94 @@
+from __future__ import unicode_literals
+
+import time, threading, sys, json, io
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def children_usage():
+    """
+    Returns the CPU time and peak RSS in bytes of all finished child processes, or None.
+
+    The CPU time is a running total, but the peak RSS is the largest of any child process
+    over the lifetime of this process, not just those run since the last call.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in bytes on macOS, and kilobytes elsewhere.
+    peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return usage.ru_utime + usage.ru_stime, peak_rss
+
+
+class BuildReport(object):
+
+    """
+    Records the timings and I/O of one run of the optimization pipeline.
+
+    Phase timings are cumulative, so a phase may be entered many times.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._start_usage = children_usage()
+        self.seconds = None
+        self.phases = OrderedDict()
+        self.modules = OrderedDict()
+        self.counters = OrderedDict()
+        self.sizes = None
+        self.environment = None
+        self.environment_version = None
+        self.optimizer_cpu_seconds = None
+        self.process_lifetime_peak_rss = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.time() - start)
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_module(self, name, seconds):
+        with self._lock:
+            self.modules[name] = seconds
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        """Stops the clock. Call once all optimizer processes have exited."""
+        self.seconds = time.time() - self._start
+        end_usage = children_usage()
+        if end_usage is not None:
+            self.optimizer_cpu_seconds = end_usage[0] - self._start_usage[0]
+            # The peak can come from an earlier build in the same process.
+            self.process_lifetime_peak_rss = end_usage[1]
+
+    def as_dict(self):
+        return OrderedDict((
+            ("seconds", self.seconds),
+            ("phases", self.phases),
+            ("modules", self.modules),
+            ("counters", self.counters),
+            ("sizes", self.sizes),
+            ("environment", self.environment),
+            ("environment_version", self.environment_version),
+            ("optimizer_cpu_seconds", self.optimizer_cpu_seconds),
+            ("process_lifetime_peak_rss", self.process_lifetime_peak_rss),
+        ))
+
+    def write(self, path):
+        with io.open(path, "w", encoding="utf-8") as handle:
+            handle.write(json.dumps(self.as_dict(), indent=2, ensure_ascii=False))
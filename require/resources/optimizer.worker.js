@@ -0,0 +1,99 @@
+/**
+ * A long-lived r.js optimizer worker for django-require.
+ *
+ * Usage: node optimizer.worker.js path/to/r.js
+ *
+ * Each line read from stdin is a JSON object with an "args" property, holding the arguments
+ * that would otherwise be passed to "r.js -o". Builds are run one at a time, and a line of
+ * JSON is written to stdout for each, containing "ok" and the captured console "output".
+ */
+var readline = require("readline"),
+    util = require("util"),
+    requirejs = require(process.argv[2]),
+    output = "",
+    queue = [],
+    running = false,
+    write = process.stdout.write.bind(process.stdout);
+
+/*
+ * Capture all console output, so stdout is reserved for build results.
+ */
+console.log = console.info = console.warn = console.error = function () {
+    output += util.format.apply(util, arguments) + "\n";
+};
+
+/*
+ * Converts "name=value" args into a build config, in the same way as r.js does for the
+ * command line.
+ */
+function convertArgs(args) {
+    var config = {},
+        needArray = ["include", "exclude", "excludeShallow", "insertRequire", "stubModules", "deps", "mainConfigFile"],
+        objProps = ["paths", "wrap", "pragmas", "pragmasOnSave", "has", "hasOnSave", "uglify", "uglify2", "closure", "map", "throwWhen"];
+    args.forEach(function (arg, i) {
+        var separatorIndex = arg.indexOf("="), prop, value, parts, target;
+        if (separatorIndex === -1) {
+            if (i === 0) {
+                config.buildFile = arg;
+                return;
+            }
+            throw new Error("Malformed name/value pair: [" + arg + "]. Format should be name=value");
+        }
+        prop = arg.substring(0, separatorIndex);
+        value = arg.substring(separatorIndex + 1);
+        if (value === "true") {
+            value = true;
+        } else if (value === "false") {
+            value = false;
+        }
+        if (needArray.indexOf(prop) !== -1) {
+            value = value.split(",");
+        }
+        parts = prop.split(".");
+        if (parts.length > 1 && objProps.indexOf(parts[0]) !== -1) {
+            target = config;
+            parts.slice(0, -1).forEach(function (part) {
+                target = target[part] = target[part] || {};
+            });
+            target[parts[parts.length - 1]] = value;
+        } else {
+            config[prop] = value;
+        }
+    });
+    return config;
+}
+
+function finish(ok) {
+    write(JSON.stringify({ok: ok, output: output}) + "\n");
+    output = "";
+    running = false;
+    next();
+}
+
+function next() {
+    var config;
+    if (running || !queue.length) {
+        return;
+    }
+    running = true;
+    try {
+        config = convertArgs(queue.shift().args);
+        config.logLevel = config.hasOwnProperty("logLevel") ? config.logLevel : 0;
+        requirejs.optimize(config, function () {
+            finish(true);
+        }, function (err) {
+            output += String(err) + "\n";
+            finish(false);
+        });
+    } catch (err) {
+        output += String(err) + "\n";
+        finish(false);
+    }
+}
+
+readline.createInterface({input: process.stdin}).on("line", function (line) {
+    if (line) {
+        queue.push(JSON.parse(line));
+        next();
+    }
+});
@@ -0,0 +1,11 @@
+from __future__ import unicode_literals
+
+from django.dispatch import Signal
+
+
+# Sent when OptimizedFilesMixin.post_process starts, with a storage argument.
+build_started = Signal()
+
+# Sent when OptimizedFilesMixin.post_process finishes, with storage and report arguments. The
+# report is a dict of timings and I/O statistics, as written to REQUIRE_BUILD_REPORT.
+build_finished = Signal()
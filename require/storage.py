@@ -1,28 +1,45 @@
 from __future__ import unicode_literals
 
-import tempfile, shutil, os.path, hashlib, subprocess
+import tempfile, shutil, os.path, sys, re, posixpath, time, json, io, threading, binascii, hashlib
+from collections import deque
 from functools import partial
 from contextlib import closing
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 
 from django.core.exceptions import ImproperlyConfigured
-from django.core.files.base import File
+from django.core.files.base import File, ContentFile
 from django.core.files.storage import FileSystemStorage
-from django.contrib.staticfiles.storage import StaticFilesStorage, CachedStaticFilesStorage
+from django.contrib.staticfiles.storage import StaticFilesStorage, CachedStaticFilesStorage, HashedFilesMixin
+from django.contrib.staticfiles.utils import matches_patterns
 from django.utils.encoding import force_text
+from django.utils.functional import cached_property
 
 from require.conf import settings as require_settings
-from require.helpers import resolve_require_url
-from require.environments import load_environment
+from require.helpers import resolve_require_url, resolve_require_module, new_hash, DigestTable, makedirs
+from require.environments import load_environment, resolve_environment
+from require.cache import BuildCache, load_build_cache
+from require.dependencies import DependencyScanner, build_dependency_graph, transitive_dependencies, reachable_names, module_id_for_name
+from require.compress import load_compressors
+from require.budgets import sizes_enabled, measure, parse_size_report, load_baseline, check_sizes, size_report_content, enforce_budgets
+from require.report import BuildReport
+from require.signals import build_started, build_finished
+
+
+SOURCE_MAPPING_URL_RE = re.compile(br"(//[#@] sourceMappingURL=)(\S+)")
 
 
 class TemporaryCompileEnvironment(object):
 
     REQUIRE_RESOURCES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "resources"))
 
-    def __init__(self, verbosity):
-        self.compile_dir = tempfile.mkdtemp()
-        self.build_dir = tempfile.mkdtemp()
+    def __init__(self, verbosity, report=None, staging_dir=None):
+        self.compile_dir = tempfile.mkdtemp(dir=staging_dir)
+        self.build_dir = tempfile.mkdtemp(dir=staging_dir)
         self.verbosity = verbosity
+        self.report = BuildReport() if report is None else report
+        # The names of the input files of each standalone module, keyed by build name.
+        self.bundle_inputs = {}
 
     def resource_path(self, name):
         return os.path.join(self.REQUIRE_RESOURCES_DIR, name)
@@ -33,29 +50,108 @@ class TemporaryCompileEnvironment(object):
     def build_dir_path(self, name):
         return os.path.abspath(os.path.join(self.build_dir, require_settings.REQUIRE_BASE_URL, name))
 
-    def run_optimizer(self, *args, **kwargs):
+    @cached_property
+    def compiler(self):
         # load the environment and initialize
-        compiler = load_environment()(self)
-        compiler_args = compiler.args()
-        compiler_args.extend([self.resource_path("r.js"), "-o"])
-        compiler_args.extend(args)
+        return load_environment()(self)
+
+    def optimizer_args(self, *args, **kwargs):
+        optimizer_args = list(args)
         if self.verbosity == 0:
             kwargs.setdefault("logLevel", "4")
-        compiler_args.extend(
+        optimizer_args.extend(
             "{0}={1}".format(
                 key, value
             )
             for key, value
             in kwargs.items()
         )
-        # Run the compiler in a subprocess.
-        if subprocess.call(compiler_args) != 0:
+        return optimizer_args
+
+    def run_optimizer(self, *args, **kwargs):
+        returncode, _ = self.compiler.run_optimizer(self.optimizer_args(*args, **kwargs))
+        if returncode != 0:
             raise OptimizationError("Error while running r.js optimizer.")
 
+    def build_input_names(self, output):
+        """
+        Parses the file listing printed by r.js after building a single module, returning the
+        names of the input files relative to the compile dir, or None if any input is unknown.
+        """
+        lines = output.splitlines()
+        try:
+            start = lines.index("-" * 16) + 1
+        except ValueError:
+            return None
+        input_names = []
+        for line in lines[start:]:
+            line = line.strip()
+            if not line:
+                break
+            input_path = os.path.abspath(line)
+            if not input_path.startswith(self.compile_dir + os.sep):
+                return None
+            input_names.append(input_path[len(self.compile_dir)+1:])
+        return input_names
+
+    def _run_optimizer_captured(self, named_build):
+        name, (args, kwargs) = named_build
+        if self.verbosity == 0:
+            # Keep the file listing, so that build inputs can be recorded.
+            kwargs = dict(kwargs, logLevel=kwargs.get("logLevel", "1"))
+        start = time.time()
+        returncode, output = self.compiler.run_optimizer(self.optimizer_args(*args, **kwargs), capture=True)
+        self.report.add_module(name, time.time() - start)
+        return name, returncode, output
+
+    def iter_optimizers(self, builds, workers=1, ordered=True):
+        """
+        Runs the optimizer once for each named (args, kwargs) build, using a pool of workers,
+        yielding the name and output of each successful build as it finishes.
+
+        Builds are yielded, and their output written, in order unless ordered is False. Any
+        failures are raised together once all builds have finished.
+        """
+        builds = list(builds)
+        if not builds:
+            return
+        # Create the compiler before the workers race to create their own.
+        self.compiler
+        pool = ThreadPool(min(workers, len(builds)))
+        failed_names = []
+        try:
+            imap = pool.imap if ordered else pool.imap_unordered
+            for name, returncode, output in imap(self._run_optimizer_captured, builds):
+                if self.verbosity > 0 or returncode != 0:
+                    sys.stdout.write(output)
+                    sys.stdout.flush()
+                if returncode != 0:
+                    failed_names.append(name)
+                    continue
+                yield name, output
+        finally:
+            pool.close()
+            pool.join()
+        if failed_names:
+            raise OptimizationError("Error while running r.js optimizer for {names}.".format(
+                names = ", ".join(failed_names),
+            ))
+
+    def run_optimizers(self, builds, workers=1):
+        """
+        Runs the optimizer once for each named (args, kwargs) build, using a pool of workers.
+
+        The output of each build is written in order, and any failures are raised together once
+        all builds have finished. Returns the output of each build.
+        """
+        return [output for _, output in self.iter_optimizers(builds, workers)]
+
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
+        if "compiler" in self.__dict__:
+            self.compiler.close()
         shutil.rmtree(self.compile_dir, ignore_errors=True)
         shutil.rmtree(self.build_dir, ignore_errors=True)
 
@@ -69,111 +165,935 @@ class OptimizedFilesMixin(object):
 
     REQUIRE_COPY_BLOCK_SIZE = 1024*1024  # 1 MB.
 
+    # The hashes used in the hashed names of files read by the optimizer, keyed by name, or None
+    # if this storage does not hash file names.
+    _file_hashes = None
+
     def _file_iter(self, handle):
         return iter(partial(handle.read, self.REQUIRE_COPY_BLOCK_SIZE), b'')
 
-    def post_process(self, paths, dry_run=False, verbosity=1, **options):
-        # If this is a dry run, give up now!
-        if dry_run:
+    def _profile_names(self):
+        profile_names = []
+        if require_settings.REQUIRE_BUILD_PROFILE:
+            profile_names.append(resolve_require_url(require_settings.REQUIRE_BUILD_PROFILE))
+        for standalone_config in require_settings.REQUIRE_STANDALONE_MODULES.values():
+            if "build_profile" in standalone_config:
+                profile_names.append(resolve_require_url(standalone_config["build_profile"]))
+        shared_chunk = require_settings.REQUIRE_SHARED_CHUNK
+        if shared_chunk is not None and "build_profile" in shared_chunk:
+            profile_names.append(resolve_require_url(shared_chunk["build_profile"]))
+        return profile_names
+
+    def _referenced_names(self, paths):
+        """Returns the names referenced by a string in one of the build profiles."""
+        referenced_names = set()
+        for profile_name in self._profile_names():
+            if profile_name not in paths:
+                continue
+            storage, path = paths[profile_name]
+            with closing(storage.open(path, "rb")) as handle:
+                profile = force_text(handle.read(), errors="replace")
+            for reference in re.findall(r'["\']([^"\'\\\n]+)["\']', profile):
+                referenced_names.add(resolve_require_url(reference))
+        return referenced_names
+
+    def _compile_names(self, paths, scanner):
+        """
+        Returns the names of the collected files to copy into the compile dir.
+
+        Unless REQUIRE_COPY_ALL is True and REQUIRE_STREAMING is False, this is limited to files under REQUIRE_BASE_URL, and any
+        files or directories referenced by a string in one of the build profiles.
+
+        If REQUIRE_PRUNE_MODULES is True, modules that cannot be reached from a standalone module
+        or a module named in one of the build profiles are also left out.
+        """
+        compile_names = list(paths.keys())
+        if require_settings.REQUIRE_STREAMING or not require_settings.REQUIRE_COPY_ALL:
+            base_url = resolve_require_url(".")
+            referenced_names = self._referenced_names(paths)
+            # Filter the collected files.
+            compile_names = []
+            for name in paths.keys():
+                storage_name = name.replace(os.sep, "/")
+                if storage_name.startswith(base_url + "/") or any(
+                    storage_name == referenced_name or
+                    storage_name == referenced_name + ".js" or
+                    storage_name.startswith(referenced_name + "/")
+                    for referenced_name in referenced_names
+                ):
+                    compile_names.append(name)
+        if require_settings.REQUIRE_PRUNE_MODULES:
+            compile_names = self._reachable_compile_names(paths, compile_names, scanner)
+        return compile_names
+
+    def _module_sources(self, paths, names):
+        for name in names:
+            storage_name = name.replace(os.sep, "/")
+            if module_id_for_name(storage_name) is None:
+                continue
+            storage, path = paths[name]
+            with closing(storage.open(path, "rb")) as handle:
+                yield storage_name, force_text(handle.read(), errors="replace")
+
+    def _reachable_compile_names(self, paths, compile_names, scanner):
+        """
+        Filters the compile names down to the modules reachable from the standalone modules and
+        the modules named in the build profiles, along with every file that is not a module.
+
+        If a reachable module has a dependency that does not resolve to one of the compile names,
+        such as a paths alias, a loader plugin resource or a require() call with a computed id,
+        nothing is filtered.
+        """
+        unresolved = {}
+        graph = build_dependency_graph(self._module_sources(paths, compile_names), scan=scanner.scan, unresolved=unresolved)
+        root_names = set(resolve_require_module(module) for module in require_settings.REQUIRE_STANDALONE_MODULES)
+        for referenced_name in self._referenced_names(paths):
+            root_names.update((referenced_name, referenced_name + ".js"))
+        profile_names = set(self._profile_names())
+        root_names.difference_update(profile_names)
+        # Without any modules to start from, r.js optimizes every file.
+        if not any(root_name in graph for root_name in root_names):
+            return compile_names
+        require_js_name = resolve_require_url(require_settings.REQUIRE_JS)
+        root_names.update(profile_names)
+        root_names.add(require_js_name)
+        names = reachable_names(graph, root_names)
+        # r.js may need files that cannot be found by scanning, so stage them all.
+        if any(name in unresolved for name in names - profile_names - set([require_js_name])):
+            return compile_names
+        return [
+            name
+            for name
+            in compile_names
+            if name.replace(os.sep, "/") not in graph or name.replace(os.sep, "/") in names
+        ]
+
+    def _staging_dir(self, paths, compile_names, report):
+        """
+        Returns REQUIRE_STAGING_DIR if the build is estimated to fit in it, or None to stage the
+        build in the default temporary dir.
+        """
+        staging_dir = require_settings.REQUIRE_STAGING_DIR
+        if staging_dir is None:
+            return None
+        # The compile dir holds every compiled file, and the build dir up to one more copy of each.
+        estimate = 2 * sum(storage.size(path) for storage, path in (paths[name] for name in compile_names))
+        report.count("staging_bytes_estimate", estimate)
+        max_bytes = require_settings.REQUIRE_STAGING_MAX_BYTES
+        if max_bytes is not None and estimate > max_bytes:
+            return None
+        try:
+            stat = os.statvfs(staging_dir)
+        except (AttributeError, OSError):  # Windows, or a missing dir.
+            return None
+        if estimate > stat.f_bavail * stat.f_frsize:
+            return None
+        return staging_dir
+
+    def _copy_file(self, storage, path, dst_path, report, file_hash=None):
+        """
+        Copies a file into the compile dir, returning its digest and size.
+
+        If REQUIRE_COPY_MODE is "hardlink" or "symlink" and the file is on the local filesystem,
+        the file is linked instead of copied.
+
+        If a file hash is given, it is also updated with the contents of the file.
+        """
+        copy_mode = require_settings.REQUIRE_COPY_MODE
+        if copy_mode not in ("copy", "hardlink", "symlink"):
+            raise ImproperlyConfigured("Invalid REQUIRE_COPY_MODE setting: {copy_mode!r}.".format(
+                copy_mode = copy_mode,
+            ))
+        if copy_mode != "copy":
+            try:
+                src_path = storage.path(path)
+            except NotImplementedError:
+                src_path = None
+            if src_path is not None:
+                try:
+                    if copy_mode == "hardlink":
+                        os.link(src_path, dst_path)
+                    else:
+                        os.symlink(os.path.abspath(src_path), dst_path)
+                except (OSError, AttributeError):
+                    pass  # Linking is not supported here, so copy instead.
+                else:
+                    report.count("files_linked")
+                    return self._hash_file(dst_path, report, file_hash), os.path.getsize(dst_path)
+        # Copy and generate hash.
+        hash = new_hash()
+        size = 0
+        with closing(storage.open(path, "rb")) as src_handle:
+            with open(dst_path, "wb") as dst_handle:
+                for block in self._file_iter(src_handle):
+                    hash.update(block)
+                    if file_hash is not None:
+                        file_hash.update(block)
+                    dst_handle.write(block)
+                    size += len(block)
+        report.count("files_copied")
+        report.count("bytes_copied", size)
+        report.count("bytes_hashed", size)
+        return hash.digest(), size
+
+    def _hash_file(self, path, report, file_hash=None):
+        hash = new_hash()
+        with open(path, "rb") as handle:
+            for block in self._file_iter(handle):
+                hash.update(block)
+                if file_hash is not None:
+                    file_hash.update(block)
+                report.count("bytes_hashed", len(block))
+        return hash.digest()
+
+    def _new_file_hash(self):
+        """
+        Returns a hash to update with the contents of a file as the optimizer reads it, so that
+        its hashed name can be found without reading it again, or None if this storage does not
+        hash file names.
+        """
+        if self._file_hashes is None:
+            return None
+        return hashlib.md5()
+
+    def _record_file_hash(self, name, file_hash):
+        if file_hash is not None:
+            self._file_hashes[name.replace(os.sep, "/")] = file_hash.hexdigest()[:12]
+
+    def file_hash(self, name, content=None):
+        """
+        Returns the hash used in the hashed name of a file, reusing the hash computed when the
+        optimizer last read or wrote it.
+
+        Files whose contents are adjusted to refer to hashed names, such as CSS files, are always
+        hashed again, as are all files if a later class overrides how files are hashed.
+        """
+        file_hashes = self._file_hashes
+        if file_hashes is not None and name in file_hashes and not matches_patterns(name, getattr(self, "_patterns", {})):
+            next_file_hash = getattr(super(OptimizedFilesMixin, type(self)), "file_hash", None)
+            if getattr(next_file_hash, "__func__", next_file_hash) is getattr(HashedFilesMixin.file_hash, "__func__", HashedFilesMixin.file_hash):
+                return file_hashes[name]
+        return super(OptimizedFilesMixin, self).file_hash(name, content)
+
+    def _modified_names(self, env, compile_info, exclude_names):
+        """
+        Returns the names of the files in the build dir that were modified or created by the
+        optimizer, plus any excluded files, in walk order.
+
+        Files with a different size to the original are known to be modified without being
+        read. The remaining files are hashed in a pool of worker threads.
+        """
+        start = time.time()
+        build_names = []
+        hash_names = []
+        for build_dirpath, _, build_filenames in os.walk(env.build_dir):
+            build_dirpath = force_text(build_dirpath)
+            for build_filename in build_filenames:
+                build_filename = force_text(build_filename)
+                # Determine asset name.
+                build_filepath = os.path.join(build_dirpath, build_filename)
+                build_name = build_filepath[len(env.build_dir)+1:]
+                build_names.append(build_name)
+                # Only hash files that might be unmodified.
+                if build_name in compile_info and build_name.replace(os.sep, "/") not in exclude_names:
+                    if os.path.getsize(build_filepath) == compile_info.size(build_name):
+                        hash_names.append(build_name)
+        # Hash the remaining files.
+        unmodified_names = set()
+        if hash_names:
+            pool = ThreadPool(min(require_settings.REQUIRE_HASH_WORKERS or cpu_count(), len(hash_names)))
+            try:
+                digests = pool.map(partial(self._hash_file, report=env.report), [os.path.join(env.build_dir, name) for name in hash_names])
+            finally:
+                pool.close()
+                pool.join()
+            unmodified_names.update(
+                name
+                for name, digest
+                in zip(hash_names, digests)
+                if digest == compile_info[name]
+            )
+        modified_names = [name for name in build_names if name not in unmodified_names]
+        env.report.add_phase("diff", time.time() - start)
+        env.report.count("files_hashed", len(hash_names))
+        return modified_names
+
+    def _dependency_sources(self, env, compile_info):
+        for name in compile_info:
+            if not name.endswith(".js"):
+                continue
+            # Scan the optimized version of the file, if there is one.
+            path = os.path.join(env.build_dir, name)
+            if not os.path.exists(path):
+                path = os.path.join(env.compile_dir, name)
+            with io.open(path, "r", encoding="utf-8", errors="replace") as handle:
+                yield name.replace(os.sep, "/"), handle.read()
+
+    def _write_dependency_manifest(self, env, compile_info, scanner):
+        """
+        Writes the AMD dependency graph of the optimized static files into the build dir, for use
+        by the require_preload template tag.
+        """
+        manifest_name = require_settings.REQUIRE_DEPENDENCY_MANIFEST
+        manifest_path = os.path.join(env.build_dir, manifest_name)
+        manifest_dir = os.path.dirname(manifest_path)
+        makedirs(manifest_dir)
+        with open(manifest_path, "wb") as handle:
+            handle.write(json.dumps({
+                "version": 1,
+                "files": build_dependency_graph(self._dependency_sources(env, compile_info), scan=scanner.scan),
+            }, sort_keys=True).encode("utf-8"))
+        return manifest_name.replace("/", os.sep)
+
+    def _compress_file(self, compressors, name):
+        with closing(self.open(name, "rb")) as handle:
+            content = handle.read()
+        compressed_names = []
+        for extension, compress in compressors:
+            compressed_name = name + extension
+            compressed_content = compress(content)
+            # Never leave a stale compressed file behind.
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            if len(compressed_content) < len(content):
+                self.save(compressed_name, ContentFile(compressed_content))
+                compressed_names.append(compressed_name)
+        return compressed_names
+
+    def _compress_files(self, names):
+        """
+        Saves a precompressed copy of each named file in every format in REQUIRE_COMPRESS, using a
+        pool of worker threads. Compressed copies that would not be smaller are skipped.
+
+        Returns the names of the compressed files.
+        """
+        compressors = load_compressors()
+        if not compressors or not names:
+            return []
+        pool = ThreadPool(min(require_settings.REQUIRE_COMPRESS_WORKERS or cpu_count(), len(names)))
+        try:
+            results = pool.map(partial(self._compress_file, compressors), names)
+        finally:
+            pool.close()
+            pool.join()
+        return [compressed_name for compressed_names in results for compressed_name in compressed_names]
+
+    def save_optimized_file(self, name, content):
+        """
+        Saves an optimized file over the named asset.
+
+        Override this to customize how optimized files are uploaded. It may be called from
+        several threads at once if REQUIRE_UPLOAD_WORKERS is greater than 1.
+        """
+        # Storages that overwrite files on save don't need the extra delete.
+        if not getattr(self, "file_overwrite", False):
+            self.delete(name)
+        self.save(name, content)
+
+    def move_optimized_file(self, name, path):
+        """
+        Moves an optimized file from the build dir over the named asset, returning False if the
+        file must be saved with save_optimized_file() instead.
+
+        This only succeeds for local filesystem storages on the same filesystem as the build dir,
+        where the file is renamed into place atomically.
+        """
+        if not isinstance(self, FileSystemStorage):
+            return False
+        dst_path = self.path(name)
+        dst_dir = os.path.dirname(dst_path)
+        makedirs(dst_dir)
+        try:
+            os.rename(path, dst_path)
+        except OSError:
+            return False  # On another filesystem, or the destination exists on Windows.
+        if self.file_permissions_mode is not None:
+            os.chmod(dst_path, self.file_permissions_mode)
+        return True
+
+    def _save_optimized_file(self, env, build_name, move=True):
+        build_storage_name = build_name.replace(os.sep, "/")
+        build_path = os.path.join(env.build_dir, build_name)
+        size = os.path.getsize(build_path)
+        file_hash = self._new_file_hash()
+        if file_hash is not None:
+            self._hash_file(build_path, env.report, file_hash)
+            self._record_file_hash(build_name, file_hash)
+        if move and self.move_optimized_file(build_storage_name, build_path):
+            env.report.count("files_moved")
+        else:
+            with File(open(build_path, "rb"), build_storage_name) as build_handle:
+                self.save_optimized_file(build_storage_name, build_handle)
+            env.report.count("files_saved")
+        env.report.count("bytes_saved", size)
+
+    def _save_optimized_files(self, env, build_names):
+        """
+        Saves the named files from the build dir, yielding each name in order once saved.
+
+        Files are saved by a pool of REQUIRE_UPLOAD_WORKERS threads, with no more than
+        REQUIRE_UPLOAD_MAX_BYTES of files being saved at once, or no limit if it is None.
+        """
+        workers = require_settings.REQUIRE_UPLOAD_WORKERS or cpu_count()
+        if workers == 1 or len(build_names) <= 1:
+            for build_name in build_names:
+                self._save_optimized_file(env, build_name)
+                yield build_name
             return
-        # Compile in a temporary environment.
-        with TemporaryCompileEnvironment(verbosity=verbosity) as env:
-            exclude_names = list(require_settings.REQUIRE_EXCLUDE)
+        max_bytes = require_settings.REQUIRE_UPLOAD_MAX_BYTES
+        in_flight = [0]
+        in_flight_changed = threading.Condition()
+        def save(build_name, size):
+            try:
+                self._save_optimized_file(env, build_name)
+            finally:
+                with in_flight_changed:
+                    in_flight[0] -= size
+                    in_flight_changed.notify_all()
+        pool = ThreadPool(min(workers, len(build_names)))
+        try:
+            pending = deque()
+            for build_name in build_names:
+                size = 0
+                if max_bytes is not None:
+                    # A single file larger than the limit is saved on its own.
+                    size = min(os.path.getsize(os.path.join(env.build_dir, build_name)), max_bytes)
+                    with in_flight_changed:
+                        while in_flight[0] + size > max_bytes:
+                            in_flight_changed.wait()
+                        in_flight[0] += size
+                pending.append((build_name, pool.apply_async(save, (build_name, size))))
+                # Report on saved files as soon as possible, in order.
+                while pending and pending[0][1].ready():
+                    pending[0][1].get()
+                    yield pending.popleft()[0]
+            while pending:
+                pending[0][1].get()
+                yield pending.popleft()[0]
+        finally:
+            pool.close()
+            pool.join()
+
+    def _shared_module_ids(self, env, compile_info, scanner):
+        """
+        Returns the ids of the modules that enough standalone modules depend on to be built into
+        the shared chunk, as found by scanning the compiled assets.
+        """
+        min_modules = require_settings.REQUIRE_SHARED_CHUNK.get("min_modules", 2)
+        sources = []
+        for name in sorted(compile_info):
+            if name.endswith(".js"):
+                with io.open(os.path.join(env.compile_dir, name), "r", encoding="utf-8", errors="replace") as handle:
+                    sources.append((name.replace(os.sep, "/"), handle.read()))
+        graph = build_dependency_graph(sources, scan=scanner.scan)
+        standalone_names = set(resolve_require_module(module) for module in require_settings.REQUIRE_STANDALONE_MODULES)
+        counts = {}
+        for standalone_name in standalone_names:
+            for dependency_name in transitive_dependencies(graph, standalone_name):
+                counts[dependency_name] = counts.get(dependency_name, 0) + 1
+        return sorted(
+            module_id_for_name(name)
+            for name, count
+            in counts.items()
+            if count >= min_modules and name not in standalone_names
+        )
+
+    def _source_map_kwargs(self):
+        if not require_settings.REQUIRE_SOURCE_MAPS:
+            return {}
+        # r.js cannot generate source maps while preserving license comments.
+        return {
+            "generateSourceMaps": "true",
+            "preserveLicenseComments": "false",
+        }
+
+    def _rewrite_source_maps(self, env, output_names):
+        """
+        Points the sourceMappingURL of each optimized file at the hashed name of its source map,
+        for storages that hash file names, so that both can be cached forever.
+
+        Files that already refer to the hashed name of an unchanged source map are left alone.
+        Returns the names of the rewritten files.
+        """
+        rewritten_names = []
+        if not hasattr(self, "hashed_name"):
+            return rewritten_names
+        storage_names = set(output_name.replace(os.sep, "/") for output_name in output_names)
+        for output_name in output_names:
+            if not output_name.endswith(".js"):
+                continue
+            path = os.path.join(env.build_dir, output_name)
+            with open(path, "rb") as handle:
+                content = handle.read()
+            matches = list(SOURCE_MAPPING_URL_RE.finditer(content))
+            if not matches:
+                continue
+            match = matches[-1]
+            url = match.group(2).decode("utf-8")
+            map_name = posixpath.normpath(posixpath.join(posixpath.dirname(output_name.replace(os.sep, "/")), url))
+            # Only rewrite references to source maps from this build.
+            if map_name not in storage_names:
+                continue
+            with open(os.path.join(env.build_dir, map_name), "rb") as handle:
+                hashed_map_name = self.hashed_name(map_name, File(handle))
+            hashed_url = posixpath.join(posixpath.dirname(url), posixpath.basename(hashed_map_name)).encode("utf-8")
+            if hashed_url == match.group(2):
+                continue
+            with open(path, "wb") as handle:
+                handle.write(content[:match.start(2)] + hashed_url + content[match.end(2):])
+            env.report.count("source_maps_rewritten")
+            rewritten_names.append(output_name)
+        return rewritten_names
+
+    def _run_optimizers(self, env, compile_info, build_cache=None, scanner=None, ordered=True):
+        """
+        Runs the app build profile, then builds the standalone modules, yielding the name of each
+        standalone module in the build dir once it is ready.
+
+        If ordered is False, standalone modules are yielded as soon as they finish building.
+        """
+        # Run the app build profile.
+        if require_settings.REQUIRE_BUILD_PROFILE is not False:
+            if require_settings.REQUIRE_BUILD_PROFILE is not None:
+                app_build_js_path = env.compile_dir_path(require_settings.REQUIRE_BUILD_PROFILE)
+            else:
+                app_build_js_path = env.resource_path("app.build.js")
+            start = time.time()
+            env.run_optimizer(
+                app_build_js_path,
+                dir = env.build_dir,
+                appDir = env.compile_dir,
+                baseUrl = require_settings.REQUIRE_BASE_URL,
+                **self._source_map_kwargs()
+            )
+            env.report.add_module(os.path.basename(app_build_js_path), time.time() - start)
+        # Compile standalone modules.
+        if require_settings.REQUIRE_STANDALONE_MODULES:
+            almond_path = env.compile_dir_path("almond.js")
+            # Never write through a link to a source file.
+            if os.path.lexists(almond_path):
+                os.remove(almond_path)
+            shutil.copyfile(env.resource_path("almond.js"), almond_path)
+        shared_chunk = require_settings.REQUIRE_SHARED_CHUNK
+        shared_module_ids = None
+        if shared_chunk is not None and require_settings.REQUIRE_STANDALONE_MODULES:
+            if "out" not in shared_chunk:
+                raise ImproperlyConfigured("No 'out' option specified in REQUIRE_SHARED_CHUNK setting.")
+            shared_module_ids = self._shared_module_ids(env, compile_info, scanner or DependencyScanner())
+        standalone_builds = []
+        standalone_configs = {}
+        for standalone_module, standalone_config in sorted(require_settings.REQUIRE_STANDALONE_MODULES.items()):
+            if "out" in standalone_config:
+                build_kwargs = {
+                    "name": "almond",
+                    "include": standalone_module,
+                    "out": env.build_dir_path(standalone_config["out"]),
+                    "baseUrl": os.path.join(env.compile_dir, require_settings.REQUIRE_BASE_URL),
+                }
+                build_kwargs.update(self._source_map_kwargs())
+                # Load almond and the shared modules from the shared chunk instead.
+                if shared_module_ids is not None:
+                    standalone_config = dict(standalone_config, shared_modules=shared_module_ids)
+                    del build_kwargs["include"]
+                    build_kwargs["name"] = standalone_module
+                    if shared_module_ids:
+                        build_kwargs["exclude"] = ",".join(shared_module_ids)
+                standalone_builds.append((standalone_module, standalone_config, build_kwargs))
+            else:
+                raise ImproperlyConfigured("No 'out' option specified for module '{module}' in REQUIRE_STANDALONE_MODULES setting.".format(
+                    module = standalone_module
+                ))
+        if shared_module_ids is not None:
+            build_kwargs = {
+                "name": "almond",
+                "out": env.build_dir_path(shared_chunk["out"]),
+                "baseUrl": os.path.join(env.compile_dir, require_settings.REQUIRE_BASE_URL),
+                # Leave define() and require() global, for the standalone modules to use.
+                "wrap": "false",
+            }
+            build_kwargs.update(self._source_map_kwargs())
+            if shared_module_ids:
+                build_kwargs["include"] = ",".join(shared_module_ids)
+            standalone_builds.append((shared_chunk["out"], dict(shared_chunk, shared_modules=shared_module_ids), build_kwargs))
+        optimizer_builds = []
+        for standalone_module, standalone_config, build_kwargs in standalone_builds:
+            # Reuse the previous build if none of the module inputs have changed.
+            if build_cache is not None:
+                module_key = build_cache.module_key(env, standalone_module, standalone_config)
+                input_names = build_cache.restore_module(module_key, compile_info, build_kwargs["out"])
+                if input_names is not None:
+                    build_name = os.path.relpath(build_kwargs["out"], env.build_dir)
+                    env.bundle_inputs[build_name] = input_names
+                    yield build_name
+                    continue
+            if "build_profile" in standalone_config:
+                module_build_js_path = env.compile_dir_path(standalone_config["build_profile"])
+            else:
+                module_build_js_path = env.resource_path("module.build.js")
+            optimizer_builds.append((standalone_module, ((module_build_js_path,), build_kwargs)))
+            standalone_configs[standalone_module] = (standalone_config, build_kwargs)
+        standalone_outputs = env.iter_optimizers(
+            optimizer_builds,
+            workers = require_settings.REQUIRE_BUILD_WORKERS or cpu_count(),
+            ordered = ordered,
+        )
+        for standalone_module, output in standalone_outputs:
+            standalone_config, build_kwargs = standalone_configs[standalone_module]
+            build_name = os.path.relpath(build_kwargs["out"], env.build_dir)
+            # Record the inputs of each standalone module, for incremental rebuilds.
+            input_names = env.build_input_names(output)
+            if input_names is not None:
+                env.bundle_inputs[build_name] = list(input_names)
+                if build_cache is not None:
+                    if "build_profile" in standalone_config:
+                        input_names.append(os.path.relpath(env.compile_dir_path(standalone_config["build_profile"]), env.compile_dir))
+                    build_cache.store_module(
+                        build_cache.module_key(env, standalone_module, standalone_config),
+                        compile_info,
+                        input_names,
+                        build_kwargs["out"],
+                    )
+            yield build_name
+
+    def _sized_names(self, output_names):
+        return [
+            output_name
+            for output_name
+            in output_names
+            if posixpath.splitext(output_name.replace(os.sep, "/"))[1] in (".js", ".css")
+        ]
+
+    def _measure_sizes(self, env, compile_info, output_names):
+        """
+        Returns the raw, minified and compressed sizes of the optimized scripts and stylesheets in
+        the build dir, keyed by name.
+
+        The raw size of a standalone module is the total size of the files it was built from.
+        """
+        sizes = {}
+        for output_name in self._sized_names(output_names):
+            if output_name in env.bundle_inputs:
+                raw_size = sum(
+                    compile_info.size(input_name)
+                    for input_name
+                    in env.bundle_inputs[output_name]
+                    if input_name in compile_info
+                )
+            elif output_name in compile_info:
+                raw_size = compile_info.size(output_name)
+            else:
+                raw_size = None
+            with open(os.path.join(env.build_dir, output_name), "rb") as handle:
+                sizes[output_name.replace(os.sep, "/")] = measure(handle.read(), raw_size)
+        return sizes
+
+    def _check_sizes(self, env, sizes):
+        """
+        Checks the sizes of the optimized files against REQUIRE_SIZE_BUDGETS and the baseline,
+        saving a size report in REQUIRE_SIZE_REPORT if set.
+
+        The baseline is REQUIRE_SIZE_BASELINE, or else the previous size report.
+        """
+        env.report.sizes = sizes
+        baseline = load_baseline()
+        report_name = require_settings.REQUIRE_SIZE_REPORT
+        if baseline is None and report_name is not None and self.exists(report_name):
+            with closing(self.open(report_name, "rb")) as handle:
+                baseline = parse_size_report(handle.read())
+        problems = check_sizes(sizes, baseline)
+        if report_name is not None:
+            if self.exists(report_name):
+                self.delete(report_name)
+            self._save(report_name, ContentFile(size_report_content(sizes, baseline, problems)))
+        enforce_budgets(problems)
+
+    def _fingerprint_name(self):
+        """
+        Returns the name of the file in which to store the fingerprint of the last build, next to
+        the static files manifest, or None if this storage has no manifest.
+        """
+        manifest_name = getattr(self, "manifest_name", None)
+        if manifest_name is None:
+            return None
+        root, ext = posixpath.splitext(manifest_name)
+        return root + ".require" + ext
+
+    def _fingerprint_key(self, env, compile_info):
+        hash = new_hash()
+        hash.update(BuildCache(None).key(env, compile_info).encode("ascii"))
+        # Hash the settings that affect which files are saved.
+        hash.update(json.dumps([
+            require_settings.REQUIRE_EXCLUDE,
+            require_settings.REQUIRE_DEPENDENCY_MANIFEST,
+        ], sort_keys=True).encode("utf-8"))
+        return binascii.hexlify(hash.digest()).decode("ascii")
+
+    def _load_fingerprint(self):
+        fingerprint_name = self._fingerprint_name()
+        if fingerprint_name is None:
+            return None
+        try:
+            with closing(self.open(fingerprint_name, "rb")) as handle:
+                fingerprint = json.loads(force_text(handle.read()))
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(fingerprint, dict) or fingerprint.get("version") != 1:
+            return None
+        return fingerprint
+
+    def _save_fingerprint(self, build):
+        fingerprint_name = self._fingerprint_name()
+        if fingerprint_name is None or build["key"] is None:
+            return
+        content = json.dumps({
+            "version": 1,
+            "key": build["key"],
+            "outputs": [name.replace(os.sep, "/") for name in build["outputs"]],
+            "deleted": [name.replace(os.sep, "/") for name in build["deleted"]],
+            "sizes": build["sizes"],
+        }, sort_keys=True).encode("utf-8")
+        if self.exists(fingerprint_name):
+            self.delete(fingerprint_name)
+        self._save(fingerprint_name, ContentFile(content))
+
+    def _source_digest(self, storage, path, report, file_hash=None):
+        hash = new_hash()
+        with closing(storage.open(path, "rb")) as handle:
+            for block in self._file_iter(handle):
+                hash.update(block)
+                if file_hash is not None:
+                    file_hash.update(block)
+                report.count("bytes_hashed", len(block))
+        return hash.digest()
+
+    def _stored_sizes(self, output_names):
+        """Returns the sizes of the named optimized files in this storage, without raw sizes."""
+        sizes = {}
+        for output_name in self._sized_names(output_names):
+            with closing(self.open(output_name.replace(os.sep, "/"), "rb")) as handle:
+                sizes[output_name.replace(os.sep, "/")] = measure(handle.read())
+        return sizes
+
+    def _reuse_build(self, env, paths, compile_names, fingerprint, build):
+        """
+        Reuses the optimized files of the previous build, if none of its inputs have changed and
+        all of its hashed outputs are still in the storage, returning False otherwise.
+
+        The names of the reused and deleted files are added to the build dict.
+        """
+        with env.report.phase("fingerprint"):
             compile_info = {}
-            # Copy all assets into the compile dir.
-            for name, storage_details in paths.items():
-                storage, path = storage_details
+            file_hashes = {}
+            for name in compile_names:
+                file_hashes[name] = self._new_file_hash()
+                compile_info[name] = self._source_digest(paths[name][0], paths[name][1], env.report, file_hashes[name])
+            if fingerprint.get("key") != self._fingerprint_key(env, compile_info):
+                return False
+            hashed_files = getattr(self, "hashed_files", {})
+            for name in fingerprint["outputs"]:
+                hashed_name = hashed_files.get(name)
+                if hashed_name is None or not self.exists(hashed_name):
+                    return False
+        with env.report.phase("save"):
+            for name in fingerprint["deleted"]:
+                paths.pop(name.replace("/", os.sep), None)
+                if self.exists(name):
+                    self.delete(name)
+                build["deleted"].append(name.replace("/", os.sep))
+            for name in fingerprint["outputs"]:
+                # collectstatic may have copied the unoptimized file over the optimized one.
+                try:
+                    restore = self.hashed_name(name) != hashed_files[name]
+                except ValueError:  # The unhashed file is missing.
+                    restore = True
+                if restore:
+                    with closing(self.open(hashed_files[name], "rb")) as handle:
+                        self.save_optimized_file(name, File(handle))
+                    env.report.count("files_restored")
+                paths[name.replace("/", os.sep)] = (self, name)
+                build["outputs"].append(name.replace("/", os.sep))
+        # The hashes of the reused files are already part of their hashed names.
+        if self._file_hashes is not None:
+            output_names = set(name.replace("/", os.sep) for name in fingerprint["outputs"])
+            for name, file_hash in file_hashes.items():
+                if name not in output_names:
+                    self._record_file_hash(name, file_hash)
+            for name in fingerprint["outputs"]:
+                root = posixpath.splitext(name)[0]
+                hashed_root = posixpath.splitext(hashed_files[name])[0]
+                if hashed_root.startswith(root + "."):
+                    self._file_hashes[name] = hashed_root[len(root)+1:]
+        return True
+
+    def _optimize(self, env, paths, compile_names, scanner, build):
+        """
+        Runs the optimizer over the named files, and saves the files it modifies, yielding the
+        name of each as it is saved.
+
+        The names of the saved and deleted files, and the fingerprint of the build, are added to
+        the build dict.
+
+        If REQUIRE_STREAMING is True, each standalone module is also saved and yielded as soon as
+        it is built, and only saved again if a later stage modifies it.
+        """
+        report = env.report
+        exclude_names = list(require_settings.REQUIRE_EXCLUDE)
+        compile_info = DigestTable()
+        # Copy assets into the compile dir.
+        with report.phase("copy"):
+            for name in compile_names:
+                storage, path = paths[name]
                 dst_path = os.path.join(env.compile_dir, name)
                 dst_dir = os.path.dirname(dst_path)
-                if not os.path.exists(dst_dir):
-                    os.makedirs(dst_dir)
-                # Copy and generate md5
-                hash = hashlib.md5()
-                with closing(storage.open(path, "rb")) as src_handle:
-                    with open(dst_path, "wb") as dst_handle:
-                        for block in self._file_iter(src_handle):
-                            hash.update(block)
-                            dst_handle.write(block)
+                makedirs(dst_dir)
                 # Store details of file.
-                compile_info[name] = hash.digest()
-            # Run the optimizer.
-            if require_settings.REQUIRE_BUILD_PROFILE is not False:
-                if require_settings.REQUIRE_BUILD_PROFILE is not None:
-                    app_build_js_path = env.compile_dir_path(require_settings.REQUIRE_BUILD_PROFILE)
-                else:
-                    app_build_js_path = env.resource_path("app.build.js")
-                env.run_optimizer(
-                    app_build_js_path,
-                    dir = env.build_dir,
-                    appDir = env.compile_dir,
-                    baseUrl = require_settings.REQUIRE_BASE_URL,
-                )
-            # Compile standalone modules.
-            if require_settings.REQUIRE_STANDALONE_MODULES:
-                shutil.copyfile(
-                    env.resource_path("almond.js"),
-                    env.compile_dir_path("almond.js"),
-                )
-                exclude_names.append(resolve_require_url("almond.js"))
-            for standalone_module, standalone_config in require_settings.REQUIRE_STANDALONE_MODULES.items():
-                if "out" in standalone_config:
-                    if "build_profile" in standalone_config:
-                        module_build_js_path = env.compile_dir_path(standalone_config["build_profile"])
-                    else:
-                        module_build_js_path = env.resource_path("module.build.js")
-                    env.run_optimizer(
-                        module_build_js_path,
-                        name = "almond",
-                        include = standalone_module,
-                        out = env.build_dir_path(standalone_config["out"]),
-                        baseUrl = os.path.join(env.compile_dir, require_settings.REQUIRE_BASE_URL),
-                    )
-                else:
-                    raise ImproperlyConfigured("No 'out' option specified for module '{module}' in REQUIRE_STANDALONE_MODULES setting.".format(
-                        module = standalone_module
-                    ))
-            # Update assets with modified ones.
-            compiled_storage = FileSystemStorage(env.build_dir)
-            # Walk the compiled directory, checking for modified assets.
-            for build_dirpath, _, build_filenames in os.walk(env.build_dir):
-                build_dirpath = force_text(build_dirpath)
-                for build_filename in build_filenames:
-                    build_filename = force_text(build_filename)
-                    # Determine asset name.
-                    build_filepath = os.path.join(build_dirpath, build_filename)
-                    build_name = build_filepath[len(env.build_dir)+1:]
-                    build_storage_name = build_name.replace(os.sep, "/")
-                    # Ignore certain files.
-                    if build_storage_name in exclude_names:
-                        # Delete from storage, if originally present.
-                        if build_name in compile_info:
-                            del paths[build_name]
-                            self.delete(build_storage_name)
-                        continue
-                    # Update the asset.
-                    with File(open(build_filepath, "rb"), build_storage_name) as build_handle:
-                        # Calculate asset hash.
-                        hash = hashlib.md5()
-                        for block in self._file_iter(build_handle):
-                            hash.update(block)
-                        build_handle.seek(0)
-                        # Check if the asset has been modifed.
-                        if build_name in compile_info:
-                            # Get the hash of the new file.
-                            if hash.digest() == compile_info[build_name]:
-                                continue
-                        # If we're here, then the asset has been modified by the build script! Time to re-save it!
-                        paths[build_name] = (compiled_storage, build_name)
-                        # It's definitely time to save this file.
+                file_hash = self._new_file_hash()
+                compile_info.add(name, *self._copy_file(storage, path, dst_path, report, file_hash))
+                self._record_file_hash(name, file_hash)
+        if require_settings.REQUIRE_STANDALONE_MODULES:
+            exclude_names.append(resolve_require_url("almond.js"))
+        # Check for a cached build.
+        # Strict size budgets are checked once the build has finished, so nothing can be saved before then.
+        streaming = require_settings.REQUIRE_STREAMING and not (sizes_enabled() and require_settings.REQUIRE_SIZE_BUDGETS_STRICT)
+        streamed_names = set()
+        build_cached = False
+        start = time.time()
+        build_cache = load_build_cache()
+        if build_cache is not None:
+            build_cache_key = build_cache.key(env, compile_info)
+            build_cached = build_cache.restore(build_cache_key, env.build_dir)
+        if not build_cached:
+            for build_name in self._run_optimizers(env, compile_info, build_cache, scanner, ordered=not streaming):
+                if not streaming or build_name.replace(os.sep, "/") in exclude_names:
+                    continue
+                report.add_phase("optimize", time.time() - start)
+                # Save a copy, leaving the build dir intact for the later stages.
+                with report.phase("save"):
+                    self._save_optimized_file(env, build_name, move=False)
+                streamed_names.add(build_name)
+                yield build_name, build_name, True
+                start = time.time()
+        report.add_phase("optimize", time.time() - start)
+        # Update assets with modified ones.
+        compiled_storage = FileSystemStorage(env.build_dir)
+        build_names = []
+        output_names = build["outputs"]
+        # Check the compiled directory for modified assets.
+        for build_name in self._modified_names(env, compile_info, exclude_names):
+            build_storage_name = build_name.replace(os.sep, "/")
+            # Ignore certain files.
+            if build_storage_name in exclude_names:
+                # Delete from storage, if originally present.
+                if build_name in compile_info:
+                    del paths[build_name]
+                    with report.phase("save"):
                         self.delete(build_storage_name)
-                        self.save(build_storage_name, build_handle)
-                        # Report on the modified asset.
-                        yield build_name, build_name, True
-            # Report on modified assets.
-            super_class = super(OptimizedFilesMixin, self)
-            if hasattr(super_class, "post_process"):
-                for path in super_class.post_process(paths, dry_run, **options):
-                    yield path
+                    build_names.append(build_name)
+                    build["deleted"].append(build_name)
+                continue
+            # If we're here, then the asset has been modified by the build script! Time to re-save it!
+            build_names.append(build_name)
+            output_names.append(build_name)
+        build["key"] = self._fingerprint_key(env, compile_info)
+        # The hashes of modified files are recorded again once they are saved.
+        if self._file_hashes is not None:
+            for output_name in output_names:
+                if output_name not in streamed_names:
+                    self._file_hashes.pop(output_name.replace(os.sep, "/"), None)
+        # Store the build for next time.
+        if build_cache is not None and not build_cached:
+            build_cache.store(build_cache_key, env.build_dir, build_names)
+        # Write the dependency manifest.
+        if require_settings.REQUIRE_DEPENDENCY_MANIFEST:
+            with report.phase("dependencies"):
+                output_names.append(self._write_dependency_manifest(env, compile_info, scanner))
+        scanner.save()
+        # Point optimized files at their hashed source maps, leaving the build cache unhashed.
+        if require_settings.REQUIRE_SOURCE_MAPS:
+            streamed_names.difference_update(self._rewrite_source_maps(env, output_names))
+        # Check size budgets before saving the optimized files.
+        if sizes_enabled():
+            with report.phase("sizes"):
+                build["sizes"] = self._measure_sizes(env, compile_info, output_names)
+                self._check_sizes(env, build["sizes"])
+        # Optimized files may be moved out of the build dir, so later stages read them from here.
+        for output_name in output_names:
+            if isinstance(self, FileSystemStorage):
+                paths[output_name] = (self, output_name.replace(os.sep, "/"))
+            else:
+                paths[output_name] = (compiled_storage, output_name)
+        # It's definitely time to save the modified assets.
+        start = time.time()
+        for output_name in self._save_optimized_files(env, [name for name in output_names if name not in streamed_names]):
+            # Report on the modified asset.
+            yield output_name, output_name, True
+        report.add_phase("save", time.time() - start)
+
+    def post_process(self, paths, dry_run=False, verbosity=1, **options):
+        # If this is a dry run, give up now!
+        if dry_run:
+            return
+        report = BuildReport()
+        build_started.send(sender=self.__class__, storage=self)
+        # Let storages that hash file names reuse the hashes of the files read by the optimizer.
+        self._file_hashes = {} if hasattr(super(OptimizedFilesMixin, self), "file_hash") else None
+        try:
+            # Fail before doing any work if r.js cannot be run.
+            environment, report.environment_version = resolve_environment()
+            report.environment = "{0}.{1}".format(environment.__module__, environment.__name__)
+            # Dependency scans are cached alongside the build cache, if there is one.
+            scanner = DependencyScanner(
+                None
+                if require_settings.REQUIRE_BUILD_CACHE_DIR is None
+                else os.path.join(require_settings.REQUIRE_BUILD_CACHE_DIR, "dependencies.json")
+            )
+            with report.phase("scan"):
+                compile_names = self._compile_names(paths, scanner)
+                staging_dir = self._staging_dir(paths, compile_names, report)
+            # Compile in a temporary environment.
+            fingerprint = self._load_fingerprint()
+            with TemporaryCompileEnvironment(verbosity=verbosity, report=report, staging_dir=staging_dir) as env:
+                build = {"key": None, "outputs": [], "deleted": [], "sizes": None}
+                if fingerprint is not None and self._reuse_build(env, paths, compile_names, fingerprint, build):
+                    report.count("builds_reused")
+                    if sizes_enabled():
+                        with report.phase("sizes"):
+                            build["sizes"] = fingerprint.get("sizes") or self._stored_sizes(build["outputs"])
+                            self._check_sizes(env, build["sizes"])
+                else:
+                    for output_name in self._optimize(env, paths, compile_names, scanner, build):
+                        yield output_name, output_name, True
+                output_names = build["outputs"]
+                # Report on modified assets.
+                processed_names = {}
+                super_class = super(OptimizedFilesMixin, self)
+                if hasattr(super_class, "post_process"):
+                    start = time.time()
+                    for original_path, processed_path, processed in super_class.post_process(paths, dry_run, **options):
+                        if processed_path and not isinstance(processed_path, Exception):
+                            processed_names[original_path] = processed_path
+                        yield original_path, processed_path, processed
+                    report.add_phase("post_process", time.time() - start)
+                self._file_hashes = None
+                # Remember the build, now that the manifest is complete.
+                self._save_fingerprint(build)
+                # Precompress the optimized assets, under their final names.
+                with report.phase("compress"):
+                    compressed_names = self._compress_files([
+                        processed_names.get(output_name, output_name).replace(os.sep, "/")
+                        for output_name
+                        in output_names
+                    ])
+                for compressed_name in compressed_names:
+                    yield compressed_name, compressed_name, True
+        finally:
+            # Never leave stale hashes behind if the build fails.
+            self._file_hashes = None
+        # Report on the build, now that all optimizer processes have exited.
+        report.finish()
+        if require_settings.REQUIRE_BUILD_REPORT is not None:
+            report.write(require_settings.REQUIRE_BUILD_REPORT)
+        build_finished.send(sender=self.__class__, storage=self, report=report.as_dict())
 
 
 class OptimizedStaticFilesStorage(OptimizedFilesMixin, StaticFilesStorage):
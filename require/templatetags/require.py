@@ -3,24 +3,116 @@ from __future__ import absolute_import
 from django import template
 
 from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.safestring import mark_safe
 
+try:
+    from django.urls import reverse
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import reverse
+
 from require.conf import settings as require_settings
-from require.helpers import resolve_require_url, resolve_require_module
+from require.helpers import resolve_require_url, resolve_require_module, resolve_shared_chunk, static_manifest
+from require.dependencies import preload_names
 
 
 register = template.Library()
 
 
-@register.simple_tag
-def require_module(module):
+# Rendered tags, keyed by tag, module and debug mode. Each entry also holds the static files
+# manifest it was rendered with, so entries expire whenever the manifest is reloaded. Tags are
+# not cached for storages without a manifest to check.
+_module_cache = {}
+
+
+@receiver(setting_changed)
+def clear_module_cache(**kwargs):
+    _module_cache.clear()
+
+
+def _render_cached(render, module):
+    manifest = static_manifest()
+    if manifest is False:
+        return render(module)
+    cache_key = (render, module, require_settings.REQUIRE_DEBUG)
+    cached = _module_cache.get(cache_key)
+    if cached is not None and cached[0] is manifest:
+        return cached[1]
+    html = render(module)
+    _module_cache[cache_key] = (manifest, html)
+    return html
+
+
+@register.simple_tag(takes_context=True)
+def require_module(context, module):
     """
     Inserts a script tag to load the named module, which is relative to the REQUIRE_BASE_URL setting.
 
     If the module is configured in REQUIRE_STANDALONE_MODULES, and REQUIRE_DEBUG is False, then
     then the standalone built version of the module will be loaded instead, bypassing require.js
-    for extra load performance.
+    for extra load performance. If REQUIRE_SHARED_CHUNK is set, the shared chunk is loaded first.
+
+    If REQUIRE_DEBUG and REQUIRE_DEBUG_STANDALONE are both True, then the standalone module is
+    built on demand by the require.views.standalone_module view instead.
     """
+    # Record the module for require.middleware.PreloadMiddleware.
+    request = context.get("request")
+    if request is not None:
+        if not hasattr(request, "require_modules"):
+            request.require_modules = []
+        request.require_modules.append(module)
+    html = _render_cached(_render_require_module, module)
+    # Load the shared chunk once per request, or once per template without a request, ahead of
+    # the first standalone module that needs it.
+    shared_chunk_name = resolve_shared_chunk(module)
+    if shared_chunk_name is not None:
+        if request is not None:
+            shared_chunk_loaded = getattr(request, "require_shared_chunk", False)
+            request.require_shared_chunk = True
+        else:
+            shared_chunk_loaded = context.render_context.get("require_shared_chunk", False)
+            context.render_context["require_shared_chunk"] = True
+        if not shared_chunk_loaded:
+            html = _render_cached(_render_script, shared_chunk_name) + html
+    return html
+
+
+@register.simple_tag
+def require_preload(module):
+    """
+    Inserts preload links for the scripts needed to run the named module, including all of its
+    dependencies, so that the browser can fetch them in parallel.
+
+    Dependencies are read from the REQUIRE_DEPENDENCY_MANIFEST written by collectstatic.
+    """
+    return _render_cached(_render_require_preload, module)
+
+
+def _render_require_preload(module):
+    return mark_safe("".join(
+        """<link rel="preload" href="{src}" as="script">""".format(
+            src=staticfiles_storage.url(name),
+        )
+        for name
+        in preload_names(module)
+    ))
+
+
+def _render_script(name):
+    return mark_safe("""<script src="{src}"></script>""".format(
+        src=staticfiles_storage.url(name),
+    ))
+
+
+def _render_require_module(module):
+    if require_settings.REQUIRE_DEBUG and require_settings.REQUIRE_DEBUG_STANDALONE and module in require_settings.REQUIRE_STANDALONE_MODULES:
+        return mark_safe(
+            """<script src="{module}"></script>""".format(
+                module=reverse("require_standalone_module", kwargs={"module": module}),
+            )
+        )
+
     if not require_settings.REQUIRE_DEBUG and module in require_settings.REQUIRE_STANDALONE_MODULES:
         return mark_safe(
             """<script src="{module}"></script>""".format(
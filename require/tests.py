@@ -1,24 +1,41 @@
 from __future__ import unicode_literals
 
-import tempfile, shutil, os.path, subprocess, unittest
+import tempfile, shutil, os.path, posixpath, subprocess, unittest, sys, io, json, gzip, time, hashlib, warnings
 
-from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.staticfiles.storage import staticfiles_storage, CachedStaticFilesStorage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.core.management import call_command
+from django.http import HttpResponse
 from django.test import TestCase
 from django.test.utils import override_settings
 from django.conf import settings
 from django.template import Context, Template
+from django.test.client import RequestFactory
 
+from require.budgets import SizeBudgetError, SizeBudgetWarning, check_sizes, enforce_budgets
+from require.cache import load_build_cache, BuildCache
 from require.conf import settings as require_settings
+from require.dependencies import DependencyScanner, build_dependency_graph, transitive_dependencies, reachable_names, clear_graph_cache, load_dependency_graph
+from require.environments import Environment, NodeEnvironment, resolve_environment, load_environment
+from require.helpers import DigestTable, makedirs
+from require.management.commands.require_benchmark import generate_tree
+from require.middleware import PreloadMiddleware
+from require.report import BuildReport
+from require.signals import build_finished
+from require.storage import TemporaryCompileEnvironment, OptimizedFilesMixin, OptimizedStaticFilesStorage, OptimizedCachedStaticFilesStorage
+from require import views
 
 WORKING_DIR = tempfile.mkdtemp()
 OUTPUT_DIR = tempfile.mkdtemp()
+CACHE_DIR = tempfile.mkdtemp()
 
 
 class WorkingDirMixin(object):
 
     def tearDown(self):
-        for working_dir in (WORKING_DIR, OUTPUT_DIR):
+        for working_dir in (WORKING_DIR, OUTPUT_DIR, CACHE_DIR):
             for name in os.listdir(working_dir):
                 path = os.path.join(working_dir, name)
                 if os.path.isdir(path):
@@ -75,17 +92,495 @@ class RequireModuleTest(TestCase):
             staticfiles_storage.url("js/main-built.js"),
         ))
 
+    @override_settings(REQUIRE_DEBUG=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "other": {"out": "other-built.js"}}, REQUIRE_SHARED_CHUNK={"out": "shared-built.js"})
+    def testStandaloneRequireModuleSharedChunk(self):
+        template = Template("{% load require %}{% require_module 'main' %}{% require_module 'other' %}")
+        self.assertHTMLEqual(template.render(Context({"request": RequestFactory().get("/")})), "".join(
+            """<script src="{0}"></script>""".format(staticfiles_storage.url(name))
+            for name
+            in ("js/shared-built.js", "js/main-built.js", "js/other-built.js")
+        ))
+
+    @override_settings(REQUIRE_DEBUG=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "other": {"out": "other-built.js"}}, REQUIRE_SHARED_CHUNK={"out": "shared-built.js"})
+    def testStandaloneRequireModuleSharedChunkNoRequest(self):
+        template = Template("{% load require %}{% require_module 'main' %}{% require_module 'other' %}")
+        self.assertHTMLEqual(template.render(Context({})), "".join(
+            """<script src="{0}"></script>""".format(staticfiles_storage.url(name))
+            for name
+            in ("js/shared-built.js", "js/main-built.js", "js/other-built.js")
+        ))
+
+    @override_settings(REQUIRE_DEBUG=True, REQUIRE_DEBUG_STANDALONE=True, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, ROOT_URLCONF="require.urls")
+    def testDebugStandaloneRequireModule(self):
+        self.assertHTMLEqual(self.renderTemplate(), """<script src="/main.js"></script>""")
+
+    @override_settings(REQUIRE_DEBUG=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}})
+    def testRequireModuleSettingsInvalidation(self):
+        self.renderTemplate()
+        with self.settings(REQUIRE_STANDALONE_MODULES={"main": {"out": "main-other.js"}}):
+            self.assertHTMLEqual(self.renderTemplate(), """<script src="{0}"></script>""".format(
+                staticfiles_storage.url("js/main-other.js"),
+            ))
+
+    @override_settings(REQUIRE_DEBUG=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, STATICFILES_STORAGE="django.contrib.staticfiles.storage.ManifestStaticFilesStorage")
+    def testRequireModuleManifestInvalidation(self):
+        staticfiles_storage.hashed_files = {"js/main-built.js": "js/main-built.1.js"}
+        self.assertHTMLEqual(self.renderTemplate(), """<script src="/static/js/main-built.1.js"></script>""")
+        # Reloading the manifest invalidates the rendered tag.
+        staticfiles_storage.hashed_files = {"js/main-built.js": "js/main-built.2.js"}
+        self.assertHTMLEqual(self.renderTemplate(), """<script src="/static/js/main-built.2.js"></script>""")
+
+    @override_settings(REQUIRE_DEBUG=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, STATICFILES_STORAGE="require.storage.OptimizedCachedStaticFilesStorage")
+    def testRequireModuleCachedStorage(self):
+        staticfiles_storage.hashed_files[staticfiles_storage.hash_key("js/main-built.js")] = "js/main-built.1.js"
+        self.assertHTMLEqual(self.renderTemplate(), """<script src="/static/js/main-built.1.js"></script>""")
+        # Cache-backed storages update their hashed names in place.
+        staticfiles_storage.hashed_files[staticfiles_storage.hash_key("js/main-built.js")] = "js/main-built.2.js"
+        self.assertHTMLEqual(self.renderTemplate(), """<script src="/static/js/main-built.2.js"></script>""")
+
+
+@override_settings(REQUIRE_BASE_URL="js")
+class DependencyGraphTest(TestCase):
+
+    def testBuildDependencyGraph(self):
+        graph = build_dependency_graph([
+            ("js/main.js", "require(['util', './lib/widget', 'text!template.html'], function() {});"),
+            ("js/util.js", "define(['require', 'exports'], function(require, exports) {});"),
+            ("js/lib/widget.js", "define('lib/widget', ['./helper', 'lib/inline'], function() {}); define('lib/inline', [], {});"),
+            ("js/lib/helper.js", "define(function() {});"),
+            ("js/text.js", "define({});"),
+            ("css/style.css", "body {}"),
+        ])
+        self.assertEqual(graph, {
+            "js/main.js": ["js/util.js", "js/lib/widget.js", "js/text.js"],
+            "js/util.js": [],
+            "js/lib/widget.js": ["js/lib/helper.js"],
+            "js/lib/helper.js": [],
+            "js/text.js": [],
+        })
+        self.assertEqual(transitive_dependencies(graph, "js/main.js"), ["js/util.js", "js/lib/helper.js", "js/lib/widget.js", "js/text.js"])
+
+    def testBuildDependencyGraphSugar(self):
+        unresolved = {}
+        graph = build_dependency_graph([
+            ("js/main.js", "define(function(require) { var util = require('util'); require('lib'); require('text!a.html'); });"),
+            ("js/util.js", "define('util', function(require) { return require(name); });"),
+            ("js/text.js", "define({});"),
+        ], unresolved=unresolved)
+        self.assertEqual(graph, {
+            "js/main.js": ["js/util.js", "js/text.js"],
+            "js/util.js": [],
+            "js/text.js": [],
+        })
+        # Aliases, loader plugin resources and computed ids cannot be resolved to files.
+        self.assertEqual(unresolved, {
+            "js/main.js": ["lib", "text!a.html"],
+            "js/util.js": [None],
+        })
+
+    def testBuildDependencyGraphComputedDependencies(self):
+        unresolved = {}
+        build_dependency_graph([
+            ("js/main.js", "define(dependencies, function() {});"),
+            ("js/util.js", "define(['lib/' + name, /* Helper. */ 'helper'], function() {});"),
+            ("js/helper.js", "define('helper', ['util'], function() {});"),
+            ("js/factory.js", "define(factory);"),
+        ], unresolved=unresolved)
+        self.assertEqual(unresolved, {
+            "js/main.js": [None],
+            "js/util.js": [None, "lib/"],
+        })
+
+    def testReachableNames(self):
+        graph = {"js/a.js": ["js/b.js"], "js/b.js": ["js/a.js", "js/c.js"], "js/c.js": [], "js/d.js": ["js/c.js"]}
+        self.assertEqual(reachable_names(graph, ["js/a.js", "js/missing.js"]), set(["js/a.js", "js/b.js", "js/c.js"]))
+
+    def testDependencyScannerCache(self):
+        cache_path = os.path.join(CACHE_DIR, "dependencies.json")
+        scanner = DependencyScanner(cache_path)
+        self.assertEqual(list(scanner.scan("define(['util'], function() {});")[1]), ["util"])
+        scanner.save()
+        scanner = DependencyScanner(cache_path)
+        self.assertEqual(len(scanner.results), 1)
+        self.assertEqual(list(scanner.scan("define(['util'], function() {});")[1]), ["util"])
+        scanner.scan("define(['other'], function() {});")
+        scanner.save()
+        # Only the results used by the last build are kept.
+        self.assertEqual(len(DependencyScanner(cache_path).results), 2)
+
+    def testBenchmarkTreeReachable(self):
+        src_dir = os.path.join(WORKING_DIR, "src")
+        generate_tree(src_dir, 50, 2)
+        try:
+            sources = []
+            for dirpath, _, filenames in os.walk(os.path.join(src_dir, "js")):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    with io.open(path, encoding="utf-8") as handle:
+                        sources.append((os.path.relpath(path, src_dir).replace(os.sep, "/"), handle.read()))
+            graph = build_dependency_graph(sources)
+            self.assertEqual(len(transitive_dependencies(graph, "js/main.js")), 50)
+            self.assertEqual(len(os.listdir(os.path.join(src_dir, "img"))), 2)
+        finally:
+            shutil.rmtree(src_dir)
+
+
+@override_settings(REQUIRE_JS="require.js", REQUIRE_BASE_URL="js", REQUIRE_STANDALONE_MODULES={}, REQUIRE_DEPENDENCY_MANIFEST="require-dependencies.json")
+class RequirePreloadTest(TestCase):
+
+    def setUp(self):
+        staticfiles_storage.save("require-dependencies.json", ContentFile(json.dumps({
+            "version": 1,
+            "files": {"js/main.js": ["js/util.js"], "js/util.js": []},
+        }).encode("utf-8")))
+
+    def tearDown(self):
+        staticfiles_storage.delete("require-dependencies.json")
+
+    def testRequirePreload(self):
+        self.assertHTMLEqual(Template("{% load require %}{% require_preload 'main' %}").render(Context({})), "".join(
+            """<link rel="preload" href="{0}" as="script">""".format(staticfiles_storage.url(name))
+            for name
+            in ("js/require.js", "js/main.js", "js/util.js")
+        ))
+
+    def testRequirePreloadSugar(self):
+        staticfiles_storage.save("require-dependencies.json", ContentFile(json.dumps({
+            "version": 1,
+            "files": build_dependency_graph([
+                ("js/main.js", "define(function(require) { require('util').test(); });"),
+                ("js/util.js", "define({});"),
+            ]),
+        }).encode("utf-8")))
+        clear_graph_cache()
+        self.assertHTMLEqual(Template("{% load require %}{% require_preload 'main' %}").render(Context({})), "".join(
+            """<link rel="preload" href="{0}" as="script">""".format(staticfiles_storage.url(name))
+            for name
+            in ("js/require.js", "js/main.js", "js/util.js")
+        ))
+
+    @override_settings(STATICFILES_STORAGE="require.storage.OptimizedCachedStaticFilesStorage")
+    def testDependencyGraphCachedStorage(self):
+        self.assertEqual(load_dependency_graph()["js/main.js"], ["js/util.js"])
+        with staticfiles_storage.open("require-dependencies.json", "wb") as handle:
+            handle.write(json.dumps({"version": 1, "files": {}}).encode("utf-8"))
+        # The graph is not read again for every page.
+        self.assertEqual(load_dependency_graph()["js/main.js"], ["js/util.js"])
+
+    def testPreloadMiddleware(self):
+        request = RequestFactory().get("/")
+        Template("{% load require %}{% require_module 'main' %}").render(Context({"request": request}))
+        response = PreloadMiddleware().process_response(request, HttpResponse())
+        self.assertEqual(response["Link"], ", ".join(
+            "<{0}>; rel=preload; as=script".format(staticfiles_storage.url(name))
+            for name
+            in ("js/require.js", "js/main.js", "js/util.js")
+        ))
+
+
+@override_settings(REQUIRE_BASE_URL="js", REQUIRE_JS="require.js", REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_PRUNE_MODULES=True)
+class PruneModulesTest(WorkingDirMixin, TestCase):
+
+    def compileNames(self, sources):
+        os.mkdir(os.path.join(WORKING_DIR, "js"))
+        paths = {}
+        for name, source in sources.items():
+            with open(os.path.join(WORKING_DIR, name), "w") as handle:
+                handle.write(source)
+            paths[name] = (FileSystemStorage(WORKING_DIR), name)
+        storage = OptimizedStaticFilesStorage(location=OUTPUT_DIR)
+        return sorted(storage._compile_names(paths, DependencyScanner()))
+
+    def testSugar(self):
+        self.assertEqual(self.compileNames({
+            "js/main.js": "define(function(require) { require('util').test(); });",
+            "js/util.js": "define({});",
+            "js/unused.js": "define({});",
+        }), ["js/main.js", "js/util.js"])
+
+    def testComputedDependencies(self):
+        # Computed dependencies can only be found by r.js, so nothing is pruned.
+        self.assertEqual(self.compileNames({
+            "js/main.js": "define(['util'].concat(extra), function(util) {});",
+            "js/util.js": "define({});",
+            "js/unused.js": "define({});",
+        }), ["js/main.js", "js/unused.js", "js/util.js"])
+
+    def testAlias(self):
+        # An aliased module can only be found by r.js, so nothing is pruned.
+        self.assertEqual(self.compileNames({
+            "js/main.js": "require.config({paths: {lib: 'vendor/lib'}}); define(['lib'], function(lib) {});",
+            "js/vendor.js": "define({});",
+            "js/unused.js": "define({});",
+        }), ["js/main.js", "js/unused.js", "js/vendor.js"])
+
+
+@override_settings(REQUIRE_BASE_URL="js", REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "other": {"out": "other-built.js"}}, REQUIRE_SHARED_CHUNK={"out": "shared-built.js"})
+class SharedModulesTest(TestCase):
+
+    def testSugar(self):
+        with TemporaryCompileEnvironment(verbosity=0) as env:
+            os.mkdir(os.path.join(env.compile_dir, "js"))
+            for name, source in (
+                ("js/main.js", "define(function(require) { require('util').test(); });"),
+                ("js/other.js", "define(function(require) { require('util').test(); });"),
+                ("js/util.js", "define({});"),
+            ):
+                with open(os.path.join(env.compile_dir, name), "w") as handle:
+                    handle.write(source)
+            storage = OptimizedStaticFilesStorage(location=OUTPUT_DIR)
+            compile_info = {"js/main.js": b"", "js/other.js": b"", "js/util.js": b""}
+            self.assertEqual(storage._shared_module_ids(env, compile_info, DependencyScanner()), ["util"])
+
+
+class FileHashTest(TestCase):
+
+    def testFileHash(self):
+        storage = OptimizedCachedStaticFilesStorage(location=OUTPUT_DIR)
+        storage._file_hashes = {"js/main.js": "0123456789ab"}
+        self.assertEqual(storage.file_hash("js/main.js"), "0123456789ab")
+
+    def testCustomFileHash(self):
+        class CustomFileHashMixin(object):
+            def file_hash(self, name, content=None):
+                return "custom"
+        class CustomFileHashStorage(OptimizedFilesMixin, CustomFileHashMixin, CachedStaticFilesStorage):
+            pass
+        storage = CustomFileHashStorage(location=OUTPUT_DIR)
+        storage._file_hashes = {"js/main.js": "0123456789ab"}
+        # A custom file hash must not be bypassed by the reused hashes.
+        self.assertEqual(storage.file_hash("js/main.js"), "custom")
+
+
+@override_settings(STATICFILES_FINDERS=("django.contrib.staticfiles.finders.FileSystemFinder",), STATICFILES_DIRS=(WORKING_DIR,), STATIC_ROOT=OUTPUT_DIR, STATICFILES_STORAGE="require.storage.OptimizedManifestStaticFilesStorage", REQUIRE_JS="require.js", REQUIRE_BASE_URL="js", REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_ENVIRONMENT="require.environments.Environment")
+class FailedBuildTest(WorkingDirMixin, TestCase):
+
+    def testFailedBuildFileHashes(self):
+        os.mkdir(os.path.join(WORKING_DIR, "js"))
+        with open(os.path.join(WORKING_DIR, "js", "main.js"), "w") as handle:
+            handle.write("define({});")
+        self.assertRaises(NotImplementedError, call_command, "collectstatic", interactive=False, verbosity=0)
+        # Hashes from the failed build must not be used by later calls to file_hash().
+        self.assertIs(staticfiles_storage._file_hashes, None)
+
+
+class StagingDirTest(WorkingDirMixin, TestCase):
+
+    def setUp(self):
+        with open(os.path.join(WORKING_DIR, "main.js"), "wb") as handle:
+            handle.write(b"x" * 100)
+        self.paths = {"main.js": (FileSystemStorage(WORKING_DIR), "main.js")}
+        self.storage = OptimizedStaticFilesStorage(location=OUTPUT_DIR)
+
+    def testNoStagingDir(self):
+        self.assertEqual(self.storage._staging_dir(self.paths, ["main.js"], BuildReport()), None)
+
+    @override_settings(REQUIRE_STAGING_DIR=CACHE_DIR, REQUIRE_STAGING_MAX_BYTES=200)
+    def testStagingDir(self):
+        report = BuildReport()
+        self.assertEqual(self.storage._staging_dir(self.paths, ["main.js"], report), CACHE_DIR)
+        self.assertEqual(report.counters["staging_bytes_estimate"], 200)
+
+    @override_settings(REQUIRE_STAGING_DIR=CACHE_DIR, REQUIRE_STAGING_MAX_BYTES=199)
+    def testStagingDirOverBudget(self):
+        self.assertEqual(self.storage._staging_dir(self.paths, ["main.js"], BuildReport()), None)
+
+
+class ModuleCacheTest(WorkingDirMixin, TestCase):
+
+    def setUp(self):
+        self.out_path = os.path.join(WORKING_DIR, "main-built.js")
+        with open(self.out_path, "wb") as handle:
+            handle.write(b"built")
+
+    @override_settings(REQUIRE_MODULE_CACHE_STORAGE="django.core.files.storage.FileSystemStorage", REQUIRE_MODULE_CACHE_STORAGE_OPTIONS={"location": CACHE_DIR})
+    def testSharedStorage(self):
+        load_build_cache().store_module("key", {"js/main.js": b"a"}, ["js/main.js"], self.out_path)
+        # Another machine sharing the storage restores the module while its inputs match.
+        restore_path = os.path.join(OUTPUT_DIR, "js", "main-built.js")
+        self.assertEqual(load_build_cache().restore_module("key", {"js/main.js": b"b"}, restore_path), None)
+        self.assertEqual(load_build_cache().restore_module("key", {"js/main.js": b"a"}, restore_path), ["js/main.js"])
+        with open(restore_path, "rb") as handle:
+            self.assertEqual(handle.read(), b"built")
+
+    def testNoCache(self):
+        self.assertEqual(load_build_cache(), None)
+
+
+@override_settings(REQUIRE_BASE_URL="js")
+class SizeBudgetTest(TestCase):
+
+    sizes = {"js/main-built.js": {"raw": 3000, "minified": 1000, "compressed": 400}}
+
+    @override_settings(REQUIRE_SIZE_BUDGETS={"main-built.js": {"minified": 1000, "compressed": 300}, "other-built.js": {"minified": 1000}})
+    def testBudgets(self):
+        self.assertEqual(check_sizes(self.sizes), [
+            "js/main-built.js is 400 bytes compressed, over its budget of 300 bytes.",
+            "No optimized file js/other-built.js for its budget in REQUIRE_SIZE_BUDGETS setting.",
+        ])
+
+    @override_settings(REQUIRE_SIZE_BUDGETS={"main-built.js": {"minified": 1000}, "other-built.js": {"gzipped": 1000}})
+    def testBudgetsUnknownSize(self):
+        self.assertRaises(ImproperlyConfigured, check_sizes, self.sizes)
+
+    @override_settings(REQUIRE_SIZE_MAX_GROWTH=0.1)
+    def testGrowth(self):
+        baseline = {"js/main-built.js": {"raw": 2000, "minified": 950, "compressed": 400}}
+        self.assertEqual(check_sizes(self.sizes, baseline), [
+            "js/main-built.js grew from 2000 to 3000 bytes raw, by more than 10%.",
+        ])
+
+    def testEnforceBudgets(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            enforce_budgets(["Too big."])
+        self.assertEqual([warning.category for warning in caught], [SizeBudgetWarning])
+        with self.settings(REQUIRE_SIZE_BUDGETS_STRICT=True):
+            self.assertRaises(SizeBudgetError, enforce_budgets, ["Too big."])
+
+
+class DigestTableTest(TestCase):
+
+    def testDigestTable(self):
+        table = DigestTable()
+        table.add("js/main.js", b"a" * 16, 100)
+        table.add("js/util.js", b"b" * 16, 200)
+        table.add("js/main.js", b"c" * 16, 300)
+        self.assertEqual(dict(table), {"js/main.js": b"c" * 16, "js/util.js": b"b" * 16})
+        self.assertEqual(table.size("js/main.js"), 300)
+        self.assertRaises(ValueError, table.add, "js/main.js", b"a", 1)
+
+
+class BuildCachePruneTest(WorkingDirMixin, TestCase):
+
+    def testPrune(self):
+        with open(os.path.join(WORKING_DIR, "main-built.js"), "w") as handle:
+            handle.write("define({});")
+        build_cache = BuildCache(CACHE_DIR, max_entries=2)
+        keys = [hashlib.md5(str(index).encode("ascii")).hexdigest() for index in range(3)]
+        for index, key in enumerate(keys[:2]):
+            build_cache.store(key, WORKING_DIR, ["main-built.js"])
+            os.utime(build_cache.entry_path(key), (index, index))
+        # Restoring a build marks it as recently used.
+        self.assertTrue(build_cache.restore(keys[0], OUTPUT_DIR))
+        build_cache.store(keys[2], WORKING_DIR, ["main-built.js"])
+        self.assertEqual(sorted(os.listdir(CACHE_DIR)), sorted([keys[0], keys[2]]))
+
+
+class MakeDirsTest(WorkingDirMixin, TestCase):
+
+    def testMakeDirsExisting(self):
+        path = os.path.join(WORKING_DIR, "js", "lib")
+        makedirs(path)
+        # Another upload worker may have created the dir first.
+        makedirs(path)
+        self.assertTrue(os.path.isdir(path))
+
+    def testMakeDirsError(self):
+        path = os.path.join(WORKING_DIR, "main.js")
+        with open(path, "w") as handle:
+            handle.write("")
+        self.assertRaises(OSError, makedirs, os.path.join(path, "lib"))
+
+
+class ProbeCountingEnvironment(NodeEnvironment):
+
+    version_args = (sys.executable, "--version")
+
+    probes = 0
+
+    @classmethod
+    def probe(cls):
+        cls.probes += 1
+        return super(ProbeCountingEnvironment, cls).probe()
+
+
+class MissingEnvironment(NodeEnvironment):
+
+    version_args = ("require-missing-environment", "--version")
+
+
+class SlowStartEnvironment(Environment):
+
+    instances = 0
+
+    def __init__(self, environment):
+        super(SlowStartEnvironment, self).__init__(environment)
+        time.sleep(0.1)
+        SlowStartEnvironment.instances += 1
+
+    def run_optimizer(self, optimizer_args, capture=False):
+        return 0, ""
+
+
+class EnvironmentRegistryTest(TestCase):
+
+    @override_settings(REQUIRE_ENVIRONMENT="require.tests.ProbeCountingEnvironment")
+    def testResolveEnvironmentOnce(self):
+        ProbeCountingEnvironment.probes = 0
+        environment, version = resolve_environment()
+        self.assertIs(environment, ProbeCountingEnvironment)
+        self.assertIn("Python", version)
+        self.assertIs(load_environment(), ProbeCountingEnvironment)
+        self.assertEqual(ProbeCountingEnvironment.probes, 1)
+
+    @override_settings(REQUIRE_ENVIRONMENT="require.tests.SlowStartEnvironment")
+    def testBuildWorkersShareCompiler(self):
+        SlowStartEnvironment.instances = 0
+        with TemporaryCompileEnvironment(verbosity=0) as env:
+            list(env.iter_optimizers([("main", ((), {})), ("other", ((), {}))], workers=2))
+        self.assertEqual(SlowStartEnvironment.instances, 1)
+
+    @override_settings(REQUIRE_ENVIRONMENT="require.tests.MissingEnvironment")
+    def testResolveMissingEnvironment(self):
+        self.assertRaises(EnvironmentError, resolve_environment)
+
+    @override_settings(REQUIRE_ENVIRONMENT="require.tests.MissingEnvironment", STATICFILES_DIRS=(WORKING_DIR,), STATIC_ROOT=OUTPUT_DIR, STATICFILES_STORAGE="require.storage.OptimizedStaticFilesStorage")
+    def testCollectStaticMissingEnvironment(self):
+        self.assertRaises(EnvironmentError, call_command, "collectstatic", interactive=False, verbosity=0)
+
 
 class OptimizedStaticFilesStorageTestsMixin(WorkingDirMixin):
 
+    # Tests that run r.js, skipped if the environment is not available.
+    environment_test_names = (
+        "testCollectStatic",
+        "testCollectStaticBuildProfile",
+        "testCollectStaticStandalone",
+        "testCollectStaticStandaloneBuildProfile",
+        "testCollectStaticNoBuildProfile",
+        "testCollectStaticBuildCache",
+        "testCollectStaticBuildCacheEnvironment",
+        "testCollectStaticBuildWorkers",
+        "testCollectStaticIncrementalBuild",
+        "testCollectStaticLinkedCopy",
+        "testCollectStaticDependencyManifest",
+        "testCollectStaticCompress",
+        "testCollectStaticBuildReport",
+        "testCollectStaticUploadWorkers",
+        "testCollectStaticUploadNoMaxBytes",
+        "testCollectStaticManifestMove",
+        "testBenchmark",
+        "testCollectStaticPruneModules",
+        "testCollectStaticPruneModulesSugar",
+        "testCollectStaticSharedChunk",
+        "testCollectStaticSharedChunkPruneModules",
+        "testCollectStaticSourceMaps",
+        "testDebugStandalone",
+        "testCollectStaticReuseBuild",
+        "testCollectStaticModuleCacheStorage",
+        "testCollectStaticStreaming",
+        "testCollectStaticManifestFileHashes",
+        "testCollectStaticSizeBudgets",
+        "testCollectStaticSizeBudgetsStreaming",
+    )
+
     def __init__(self, *args, **kwargs):
         super(OptimizedStaticFilesStorageTestsMixin, self).__init__(*args, **kwargs)
         if not self.has_environment():
             skip_message = "No {environment} present.".format(environment=self.require_environment)
-            self.testCollectStatic = unittest.skip(skip_message)(self.testCollectStatic)
-            self.testCollectStaticBuildProfile = unittest.skip(skip_message)(self.testCollectStaticBuildProfile)
-            self.testCollectStaticStandalone = unittest.skip(skip_message)(self.testCollectStaticStandalone)
-            self.testCollectStaticStandaloneBuildProfile = unittest.skip(skip_message)(self.testCollectStaticStandaloneBuildProfile)
+            for test_name in self.environment_test_names:
+                setattr(self, test_name, unittest.skip(skip_message)(getattr(self, test_name)))
 
     def has_environment(self):
         try:
@@ -141,6 +636,341 @@ class OptimizedStaticFilesStorageTestsMixin(WorkingDirMixin):
             call_command("collectstatic", interactive=False, verbosity=0)
             self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
 
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "util": {"out": "util-built.js"}}, REQUIRE_BUILD_WORKERS=2)
+    def testCollectStaticBuildWorkers(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/util-built.js")))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_BUILD_CACHE_DIR=CACHE_DIR)
+    def testCollectStaticBuildCache(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+        with open(staticfiles_storage.path("js/main-built.js")) as handle:
+            contents = handle.read()
+        os.remove(staticfiles_storage.path("js/main-built.js"))
+        # A cached build must not run the optimizer.
+        reports = []
+        def receiver(report, **kwargs):
+            reports.append(report)
+        build_finished.connect(receiver)
+        try:
+            with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+                call_command("collectstatic", interactive=False, verbosity=0)
+        finally:
+            build_finished.disconnect(receiver)
+        self.assertEqual(reports[0]["modules"], {})
+        with open(staticfiles_storage.path("js/main-built.js")) as handle:
+            self.assertEqual(handle.read(), contents)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_MODULE_CACHE_STORAGE="django.core.files.storage.FileSystemStorage", REQUIRE_MODULE_CACHE_STORAGE_OPTIONS={"location": CACHE_DIR})
+    def testCollectStaticModuleCacheStorage(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+        with open(staticfiles_storage.path("js/main-built.js")) as handle:
+            contents = handle.read()
+        os.remove(staticfiles_storage.path("js/main-built.js"))
+        # A module fetched from the cache storage must not run the optimizer.
+        reports = []
+        def receiver(report, **kwargs):
+            reports.append(report)
+        build_finished.connect(receiver)
+        try:
+            with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+                call_command("collectstatic", interactive=False, verbosity=0)
+        finally:
+            build_finished.disconnect(receiver)
+        self.assertEqual(reports[0]["modules"], {})
+        with open(staticfiles_storage.path("js/main-built.js")) as handle:
+            self.assertEqual(handle.read(), contents)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_BUILD_CACHE_DIR=CACHE_DIR)
+    def testCollectStaticBuildCacheEnvironment(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+        # A build cached by another environment must not be reused.
+        with self.settings(REQUIRE_ENVIRONMENT="require.environments.Environment"):
+            self.assertRaises(NotImplementedError, call_command, "collectstatic", interactive=False, verbosity=0)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_STREAMING=True)
+    def testCollectStaticStreaming(self):
+        os.mkdir(os.path.join(WORKING_DIR, "css"))
+        with open(os.path.join(WORKING_DIR, "css", "main.css"), "w") as handle:
+            handle.write("body {}\n")
+        reports = []
+        def receiver(report, **kwargs):
+            reports.append(report)
+        build_finished.connect(receiver)
+        try:
+            with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+                call_command("collectstatic", interactive=False, verbosity=0)
+        finally:
+            build_finished.disconnect(receiver)
+        self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+        self.assertTrue(os.path.exists(staticfiles_storage.path("css/main.css")))
+        # Only the files under REQUIRE_BASE_URL are copied for r.js.
+        self.assertEqual(reports[0]["counters"]["files_copied"], 3)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_SIZE_REPORT="require-sizes.json")
+    def testCollectStaticSizeBudgets(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with open(staticfiles_storage.path("require-sizes.json")) as handle:
+                sizes = json.load(handle)["sizes"]["js/main-built.js"]
+            self.assertEqual(sizes["minified"], os.path.getsize(staticfiles_storage.path("js/main-built.js")))
+            self.assertGreater(sizes["raw"], 0)
+            self.assertLess(sizes["compressed"], sizes["minified"])
+            with self.settings(REQUIRE_SIZE_BUDGETS={"main-built.js": {"minified": 1}}, REQUIRE_SIZE_BUDGETS_STRICT=True):
+                self.assertRaises(SizeBudgetError, call_command, "collectstatic", interactive=False, verbosity=0)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_STREAMING=True, REQUIRE_SIZE_BUDGETS={"main-built.js": {"minified": 1}}, REQUIRE_SIZE_BUDGETS_STRICT=True)
+    def testCollectStaticSizeBudgetsStreaming(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            self.assertRaises(SizeBudgetError, call_command, "collectstatic", interactive=False, verbosity=0)
+        # A build over its budget must not have saved any standalone modules.
+        self.assertFalse(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+
+    @override_settings(REQUIRE_STANDALONE_MODULES={}, REQUIRE_BUILD_PROFILE=None, REQUIRE_DEPENDENCY_MANIFEST="require-dependencies.json")
+    def testCollectStaticDependencyManifest(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with open(staticfiles_storage.path("require-dependencies.json")) as handle:
+                self.assertEqual(json.load(handle)["files"]["js/main.js"], ["js/util.js"])
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "other": {"out": "other-built.js"}}, REQUIRE_SHARED_CHUNK={"out": "shared-built.js"})
+    def testCollectStaticSharedChunk(self):
+        shutil.copyfile(
+            os.path.join(WORKING_DIR, "js", "main.js"),
+            os.path.join(WORKING_DIR, "js", "other.js"),
+        )
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            # The common util module is only built into the shared chunk, along with almond.
+            with open(staticfiles_storage.path("js/shared-built.js")) as handle:
+                shared_chunk = handle.read()
+            self.assertIn("Test", shared_chunk)
+            self.assertIn("requirejs", shared_chunk)
+            for name in ("js/main-built.js", "js/other-built.js"):
+                with open(staticfiles_storage.path(name)) as handle:
+                    self.assertNotIn("Test", handle.read())
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "other": {"out": "other-built.js"}}, REQUIRE_SHARED_CHUNK={"out": "shared-built.js", "build_profile": "shared.build.js"}, REQUIRE_PRUNE_MODULES=True)
+    def testCollectStaticSharedChunkPruneModules(self):
+        shutil.copyfile(
+            os.path.join(WORKING_DIR, "js", "main.js"),
+            os.path.join(WORKING_DIR, "js", "other.js"),
+        )
+        # The shared chunk build profile is not reachable from any module, but must be kept.
+        shutil.copyfile(
+            os.path.join(self.test_resources_dir, self.test_standalone_build_profile),
+            os.path.join(WORKING_DIR, "js", "shared.build.js"),
+        )
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/shared-built.js")))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_PRUNE_MODULES=True, REQUIRE_BUILD_CACHE_DIR=CACHE_DIR)
+    def testCollectStaticPruneModules(self):
+        contents = "define([], function() {\n    // Not reachable from main.\n    return 1;\n});\n"
+        with open(os.path.join(WORKING_DIR, "js", "unused.js"), "w") as handle:
+            handle.write(contents)
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+            # Unreachable modules are collected, but not optimized.
+            with open(staticfiles_storage.path("js/unused.js")) as handle:
+                self.assertEqual(handle.read(), contents)
+            with open(staticfiles_storage.path("js/util.js")) as handle:
+                self.assertNotIn("\n    ", handle.read())
+        self.assertTrue(os.path.exists(os.path.join(CACHE_DIR, "dependencies.json")))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_PRUNE_MODULES=True)
+    def testCollectStaticPruneModulesSugar(self):
+        with open(os.path.join(WORKING_DIR, "js", "main.js"), "w") as handle:
+            handle.write("define(function(require) {\n    require(\"util\").test();\n});\n")
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with open(staticfiles_storage.path("js/main-built.js")) as handle:
+                self.assertIn("Test", handle.read())
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_UPLOAD_WORKERS=2, REQUIRE_UPLOAD_MAX_BYTES=1)
+    def testCollectStaticUploadWorkers(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+            # The optimized version of each modified file is saved.
+            for name in ("main.js", "util.js"):
+                with open(os.path.join(self.test_resources_dir, name)) as handle:
+                    source = handle.read()
+                with open(staticfiles_storage.path("js/" + name)) as handle:
+                    self.assertNotEqual(handle.read(), source)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_UPLOAD_WORKERS=2, REQUIRE_UPLOAD_MAX_BYTES=None)
+    def testCollectStaticUploadNoMaxBytes(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, STATICFILES_STORAGE="require.storage.OptimizedManifestStaticFilesStorage")
+    def testCollectStaticManifestMove(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            # The hashed copy is made from the moved file.
+            with open(staticfiles_storage.path("js/main-built.js"), "rb") as handle:
+                contents = handle.read()
+            with open(staticfiles_storage.path("staticfiles.json")) as handle:
+                hashed_name = json.load(handle)["paths"]["js/main-built.js"]
+            with open(staticfiles_storage.path(hashed_name), "rb") as handle:
+                self.assertEqual(handle.read(), contents)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_SOURCE_MAPS=True, STATICFILES_STORAGE="require.storage.OptimizedManifestStaticFilesStorage")
+    def testCollectStaticSourceMaps(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with open(staticfiles_storage.path("staticfiles.json")) as handle:
+                hashed_names = json.load(handle)["paths"]
+            # The hashed module refers to the hashed source map.
+            with open(staticfiles_storage.path(hashed_names["js/main-built.js"])) as handle:
+                self.assertTrue(handle.read().rstrip().endswith("//# sourceMappingURL={0}".format(
+                    posixpath.basename(hashed_names["js/main-built.js.map"]),
+                )))
+            self.assertTrue(os.path.exists(staticfiles_storage.path(hashed_names["js/main-built.js.map"])))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, STATICFILES_STORAGE="require.storage.OptimizedManifestStaticFilesStorage")
+    def testCollectStaticManifestFileHashes(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            for run in range(2):
+                call_command("collectstatic", interactive=False, verbosity=0)
+                with open(staticfiles_storage.path("staticfiles.json")) as handle:
+                    hashed_names = json.load(handle)["paths"]
+                # Hashes reused from the optimizer must match the saved files.
+                for name in ("js/main.js", "js/util.js", "js/main-built.js"):
+                    with open(staticfiles_storage.path(name), "rb") as handle:
+                        file_hash = hashlib.md5(handle.read()).hexdigest()[:12]
+                    self.assertEqual(hashed_names[name], "{0}.{1}.js".format(name[:-3], file_hash))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, STATICFILES_STORAGE="require.storage.OptimizedManifestStaticFilesStorage")
+    def testCollectStaticReuseBuild(self):
+        reports = []
+        def receiver(report, **kwargs):
+            reports.append(report)
+        build_finished.connect(receiver)
+        try:
+            with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+                call_command("collectstatic", interactive=False, verbosity=0)
+                with open(staticfiles_storage.path("js/main.js"), "rb") as handle:
+                    contents = handle.read()
+                with open(staticfiles_storage.path("staticfiles.json")) as handle:
+                    hashed_names = json.load(handle)["paths"]
+                # Make collectstatic copy the unoptimized files over the optimized ones.
+                mtime = time.time() + 60
+                for name in ("main.js", "util.js"):
+                    os.utime(os.path.join(WORKING_DIR, "js", name), (mtime, mtime))
+                call_command("collectstatic", interactive=False, verbosity=0)
+                with open(staticfiles_storage.path("js/main.js"), "rb") as handle:
+                    self.assertEqual(handle.read(), contents)
+                with open(staticfiles_storage.path("staticfiles.json")) as handle:
+                    self.assertEqual(json.load(handle)["paths"], hashed_names)
+        finally:
+            build_finished.disconnect(receiver)
+        self.assertNotIn("builds_reused", reports[0]["counters"])
+        self.assertEqual(reports[1]["counters"]["builds_reused"], 1)
+        self.assertGreater(reports[1]["counters"]["files_restored"], 0)
+        self.assertNotIn("optimize", reports[1]["phases"])
+
+    @override_settings(REQUIRE_BUILD_PROFILE=None, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_BUILD_REPORT=os.path.join(CACHE_DIR, "report.json"))
+    def testCollectStaticBuildReport(self):
+        reports = []
+        def receiver(report, **kwargs):
+            reports.append(report)
+        build_finished.connect(receiver)
+        try:
+            with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+                call_command("collectstatic", interactive=False, verbosity=0)
+        finally:
+            build_finished.disconnect(receiver)
+        with open(os.path.join(CACHE_DIR, "report.json")) as handle:
+            report = json.load(handle)
+        self.assertEqual(json.loads(json.dumps(reports[0])), report)
+        self.assertEqual(list(report["modules"]), ["app.build.js", "main"])
+        for phase in ("copy", "optimize", "diff", "save"):
+            self.assertIn(phase, report["phases"])
+        self.assertGreater(report["counters"]["bytes_copied"], 0)
+        self.assertGreater(report["counters"]["bytes_saved"], 0)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_COMPRESS=("gzip",), REQUIRE_COMPRESS_WORKERS=1)
+    def testCollectStaticCompress(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            with open(staticfiles_storage.path("js/main-built.js"), "rb") as handle:
+                contents = handle.read()
+            with gzip.open(staticfiles_storage.path("js/main-built.js.gz"), "rb") as handle:
+                self.assertEqual(handle.read(), contents)
+            # Files not modified by r.js are not compressed.
+            self.assertFalse(os.path.exists(staticfiles_storage.path("js/main.js.gz")))
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, REQUIRE_COPY_MODE="hardlink", REQUIRE_COPY_ALL=False)
+    def testCollectStaticLinkedCopy(self):
+        with open(os.path.join(WORKING_DIR, "js", "almond.js"), "w") as handle:
+            handle.write("// Not almond.\n")
+        with open(os.path.join(WORKING_DIR, "js", "main.js")) as handle:
+            contents = handle.read()
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/main-built.js")))
+        # Source files must never be modified through their links.
+        with open(os.path.join(WORKING_DIR, "js", "almond.js")) as handle:
+            self.assertEqual(handle.read(), "// Not almond.\n")
+        with open(os.path.join(WORKING_DIR, "js", "main.js")) as handle:
+            self.assertEqual(handle.read(), contents)
+
+    @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}, "util": {"out": "util-built.js"}}, REQUIRE_BUILD_CACHE_DIR=CACHE_DIR)
+    def testCollectStaticIncrementalBuild(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            # Change a file that only the main module depends on.
+            with open(os.path.join(WORKING_DIR, "js", "main.js"), "a") as handle:
+                handle.write("\n// Changed.\n")
+            stdout = sys.stdout
+            sys.stdout = io.StringIO()
+            try:
+                call_command("collectstatic", interactive=False, verbosity=1, stdout=io.StringIO())
+                output = sys.stdout.getvalue()
+            finally:
+                sys.stdout = stdout
+            self.assertIn("main-built.js", output)
+            self.assertNotIn("util-built.js", output)
+            self.assertTrue(os.path.exists(staticfiles_storage.path("js/util-built.js")))
+
+    @override_settings(REQUIRE_DEBUG=True, REQUIRE_DEBUG_STANDALONE=True, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js"}}, ROOT_URLCONF="require.urls")
+    def testDebugStandalone(self):
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            response = self.client.get("/main.js")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"Test", response.content)
+            # The build is cached until a source file changes.
+            self.assertIs(self.client.get("/main.js").content, views._build_cache["main"][1])
+            util_path = os.path.join(WORKING_DIR, "js", "util.js")
+            with open(util_path, "w") as handle:
+                handle.write("define(function() { return 'Changed'; });")
+            os.utime(util_path, (0, 0))
+            self.assertIn(b"Changed", self.client.get("/main.js").content)
+
+    @override_settings(REQUIRE_BUILD_CACHE_DIR=CACHE_DIR)
+    def testBenchmark(self):
+        output_path = os.path.join(CACHE_DIR, "benchmark.json")
+        with self.settings(REQUIRE_ENVIRONMENT=self.require_environment):
+            call_command("require_benchmark", sizes="20", assets=2, storage="manifest", runs=2, output=output_path, verbosity=0)
+        with open(output_path) as handle:
+            results = json.load(handle)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]["modules"], 20)
+        # Every run builds from scratch, even with a build cache configured.
+        for result in results:
+            self.assertEqual(list(result["report"]["modules"]), ["app.build.js", "main"])
+            self.assertGreater(result["report"]["counters"]["bytes_copied"], 0)
+
     @override_settings(REQUIRE_BUILD_PROFILE=False, REQUIRE_STANDALONE_MODULES={"main": {"out": "main-built.js", "build_profile": "main.build.js"}})
     def testCollectStaticNoBuildProfile(self):
         shutil.copyfile(
@@ -174,6 +1004,18 @@ class OptimizedStaticFilesStorageNodeTest(OptimizedStaticFilesStorageTestsMixin,
     test_standalone_build_profile = "module.build.js"
 
 
+@override_settings(STATICFILES_FINDERS=("django.contrib.staticfiles.finders.FileSystemFinder",), STATICFILES_DIRS=(WORKING_DIR,), STATIC_ROOT=OUTPUT_DIR, STATICFILES_STORAGE="require.storage.OptimizedStaticFilesStorage", REQUIRE_JS="require.js", REQUIRE_BASE_URL="js")
+class OptimizedStaticFilesStorageNodeDaemonTest(OptimizedStaticFilesStorageTestsMixin, TestCase):
+
+    require_environment_detection_args = ("node", "-v")
+
+    require_environment = "node-daemon"
+
+    test_build_profile = "app.build.js"
+
+    test_standalone_build_profile = "module.build.js"
+
+
 @override_settings(STATICFILES_FINDERS=("django.contrib.staticfiles.finders.FileSystemFinder",), STATICFILES_DIRS=(WORKING_DIR,), STATIC_ROOT=OUTPUT_DIR, STATICFILES_STORAGE="require.storage.OptimizedStaticFilesStorage", REQUIRE_JS="require.js", REQUIRE_BASE_URL="js")
 class OptimizedStaticFilesStorageRhinoTest(OptimizedStaticFilesStorageTestsMixin, TestCase):
 
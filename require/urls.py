@@ -0,0 +1,10 @@
+from __future__ import unicode_literals
+
+from django.conf.urls import url
+
+from require import views
+
+
+urlpatterns = [
+    url(r"^(?P<module>.+)\.js$", views.standalone_module, name="require_standalone_module"),
+]
@@ -0,0 +1,103 @@
+from __future__ import unicode_literals
+
+import os, os.path, shutil, threading
+
+from django.contrib.staticfiles import finders
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+from require.conf import settings as require_settings
+from require.helpers import resolve_require_url, makedirs
+from require.storage import TemporaryCompileEnvironment
+
+
+# Standalone modules built on demand, keyed by module. Each entry also holds the fingerprint of
+# the source files it was built from.
+_build_cache = {}
+
+_build_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def clear_build_cache(**kwargs):
+    _build_cache.clear()
+
+
+def source_paths():
+    """
+    Returns a dict mapping the name of each static file under REQUIRE_BASE_URL to its path, as
+    found by the staticfiles finders.
+    """
+    base_url = resolve_require_url(".")
+    prefix = "" if base_url == "." else base_url + "/"
+    paths = {}
+    for finder in finders.get_finders():
+        for path, storage in finder.list(["CVS", ".*", "*~"]):
+            name = path.replace(os.sep, "/")
+            if getattr(storage, "prefix", None):
+                name = "/".join((storage.prefix, name))
+            if name.startswith(prefix) and name not in paths:
+                paths[name] = storage.path(path)
+    return paths
+
+
+def source_fingerprint(module, paths):
+    """Returns a value that changes whenever the sources of a standalone module may have changed."""
+    fingerprint = [repr(sorted(require_settings.REQUIRE_STANDALONE_MODULES[module].items()))]
+    for name, path in sorted(paths.items()):
+        stat = os.stat(path)
+        fingerprint.append((name, stat.st_mtime, stat.st_size))
+    return fingerprint
+
+
+def build_standalone_module(module, paths):
+    """
+    Builds the named standalone module from the given source paths with almond.js, without
+    minification, returning its contents.
+    """
+    standalone_config = require_settings.REQUIRE_STANDALONE_MODULES[module]
+    with TemporaryCompileEnvironment(verbosity=0) as env:
+        for name, path in paths.items():
+            dst_path = os.path.join(env.compile_dir, name.replace("/", os.sep))
+            dst_dir = os.path.dirname(dst_path)
+            makedirs(dst_dir)
+            shutil.copyfile(path, dst_path)
+        shutil.copyfile(env.resource_path("almond.js"), env.compile_dir_path("almond.js"))
+        if "build_profile" in standalone_config:
+            module_build_js_path = env.compile_dir_path(standalone_config["build_profile"])
+        else:
+            module_build_js_path = env.resource_path("module.build.js")
+        out_path = env.build_dir_path(standalone_config["out"])
+        env.run_optimizers([(module, ((module_build_js_path,), {
+            "name": "almond",
+            "include": module,
+            "out": out_path,
+            "baseUrl": os.path.join(env.compile_dir, require_settings.REQUIRE_BASE_URL),
+            "optimize": "none",
+        }))])
+        with open(out_path, "rb") as handle:
+            return handle.read()
+
+
+def standalone_module(request, module):
+    """
+    Serves a standalone module built on demand from the source files, for use with the
+    development server when REQUIRE_DEBUG and REQUIRE_DEBUG_STANDALONE are True.
+
+    Built modules are cached in memory, and rebuilt whenever a source file changes.
+    """
+    if not (require_settings.REQUIRE_DEBUG and require_settings.REQUIRE_DEBUG_STANDALONE):
+        raise Http404("Standalone modules are only built on demand when REQUIRE_DEBUG_STANDALONE is True.")
+    if module not in require_settings.REQUIRE_STANDALONE_MODULES:
+        raise Http404("No module '{module}' in REQUIRE_STANDALONE_MODULES setting.".format(module=module))
+    paths = source_paths()
+    fingerprint = source_fingerprint(module, paths)
+    with _build_lock:
+        cached = _build_cache.get(module)
+        if cached is None or cached[0] != fingerprint:
+            cached = (fingerprint, build_standalone_module(module, paths))
+            _build_cache[module] = cached
+    response = HttpResponse(cached[1], content_type="application/javascript")
+    response["Cache-Control"] = "no-cache"
+    return response